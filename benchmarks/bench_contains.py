@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the multi-line search of ConfiguredFile.contains with the sliding
+lookbehind list it replaced, on a file of 1M lines and a 5-line search.
+
+Run with: python benchmarks/bench_contains.py
+"""
+
+from __future__ import unicode_literals, print_function
+
+import io
+import os
+import shutil
+import tempfile
+import timeit
+
+from bumpversion.utils import ConfiguredFile
+
+LINES = 1000000
+SEARCH = "[tool.release]\nname = demo\nchannel = stable\nsigned = true\nversion = 1.2.3"
+
+
+def sliding_lookbehind_contains(lines, search):
+    # the search of ConfiguredFile.contains up to v0.5.11
+    search_lines = search.splitlines()
+    lookbehind = []
+
+    for line in lines:
+        lookbehind.append(line.rstrip("\n"))
+
+        if len(lookbehind) > len(search_lines):
+            lookbehind = lookbehind[1:]
+
+        if (
+            search_lines[0] in lookbehind[0]
+            and search_lines[-1] in lookbehind[-1]
+            and search_lines[1:-1] == lookbehind[1:-1]
+        ):
+            return True
+    return False
+
+
+def read_lines(path):
+    with io.open(path, "rt", encoding="utf-8") as f:
+        return f.readlines()
+
+
+def write_file(path, near_misses):
+    with io.open(path, "wt", encoding="utf-8") as f:
+        for i in range(LINES - 5):
+            if near_misses:
+                # every block of five lines matches all but the last search line
+                f.write(SEARCH.splitlines()[i % 5].replace("1.2.3", "0.0.{}".format(i)) + "\n")
+            else:
+                f.write("data line {}\n".format(i))
+        f.write(SEARCH + "\n")
+
+
+def main():
+    for near_misses in (False, True):
+        print("{} lines{}:".format(LINES, ", every block a near miss" if near_misses else ""))
+        run(near_misses)
+
+
+def run(near_misses):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "big.txt")
+        write_file(path, near_misses)
+
+        lines = read_lines(path)
+        staged = ConfiguredFile(path, None)
+        staged.buffer.read()
+
+        benchmarks = (
+            # a fresh ConfiguredFile, so the file is read and decoded every time
+            ("sliding lookbehind, including read",
+             lambda: sliding_lookbehind_contains(read_lines(path), SEARCH)),
+            ("find_lines, including read",
+             lambda: ConfiguredFile(path, None).contains(SEARCH)),
+            ("sliding lookbehind, search only",
+             lambda: sliding_lookbehind_contains(lines, SEARCH)),
+            ("find_lines, search only",
+             lambda: staged.contains(SEARCH)),
+        )
+        for name, func in benchmarks:
+            assert func()
+            best = min(timeit.repeat(func, number=1, repeat=5))
+            print("  {:35} {:8.3f}s".format(name, best))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
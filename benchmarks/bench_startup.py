@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the start-up of the bumpversion entry point: the wall time of
+'bumpversion --help' outside of a repository and the slowest imports
+reported by 'python -X importtime'.
+
+Run with: python benchmarks/bench_startup.py
+"""
+
+from __future__ import unicode_literals, print_function
+
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 20
+SLOWEST = 15
+
+
+def run(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen(
+        [sys.executable] + list(args),
+        env=env,
+        cwd=tempfile.gettempdir(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    return process.communicate()[1].decode("utf-8")
+
+
+def main():
+    seconds = min(timeit.repeat(lambda: run("-m", "bumpversion", "--help"), number=1, repeat=RUNS))
+    print("bumpversion --help: {:.1f} ms (best of {})".format(seconds * 1000, RUNS))
+
+    imports = []
+    for line in run("-X", "importtime", "-c", "import bumpversion.cli").splitlines():
+        fields = line[len("import time:"):].split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            imports.append((int(fields[1]), fields[2].rstrip()))
+    print("\nslowest imports (cumulative us):")
+    for cumulative, module in sorted(imports, reverse=True)[:SLOWEST]:
+        print("{:>10} {}".format(cumulative, module))
+
+
+if __name__ == "__main__":
+    main()
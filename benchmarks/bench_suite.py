@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for parsing, bumping and serializing versions and for
+finding and replacing versions in small, medium and very large files.
+
+Needs pytest-benchmark. Run with: make benchmark
+
+That stores the results in benchmarks/results and compares them with the
+previous run, so regressions between releases show up.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import io
+import logging
+import os
+
+import pytest
+
+from bumpversion.functions import NumericFunction, ValuesFunction
+from bumpversion.index import VersionIndex
+from bumpversion.utils import LARGE_FILE_SIZE, ConfiguredFile, build_context, prefixed_environ
+from bumpversion.version_part import ConfiguredVersionPartConfiguration, VersionConfig
+
+PARSE = r"""
+    (?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)  # release
+    (\-(?P<release>[a-z]+)(?P<build>\d+))?          # pre-release
+"""
+SERIALIZE = ["{major}.{minor}.{patch}-{release}{build}", "{major}.{minor}.{patch}"]
+SEARCH = "version = {current_version}"
+REPLACE = "version = {new_version}"
+
+# lines in the files, the large one is just over the size handled through a memory map
+FILE_LINES = {
+    "small": 20,
+    "medium": 100000,
+    "large": LARGE_FILE_SIZE // len("data line 0000000\n") + 1,
+}
+
+
+@pytest.fixture(autouse=True)
+def quiet_logging():
+    # the benchmarks should measure the work, not the log handlers
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def version_config():
+    return VersionConfig(
+        PARSE,
+        SERIALIZE,
+        SEARCH,
+        REPLACE,
+        part_configs={"release": ConfiguredVersionPartConfiguration(["dev", "rc", "final"])},
+    )
+
+
+@pytest.fixture
+def context():
+    return build_context({}, prefixed_environ(), {})
+
+
+@pytest.fixture(scope="module", params=sorted(FILE_LINES))
+def target_file(request, tmpdir_factory):
+    path = str(tmpdir_factory.mktemp("bench").join("{}.txt".format(request.param)))
+    with io.open(path, "wt", encoding="utf-8") as f:
+        for i in range(FILE_LINES[request.param] // 2):
+            f.write("data line {:07d}\n".format(i))
+        f.write("version = 1.2.3\n")
+        for i in range(FILE_LINES[request.param] // 2, FILE_LINES[request.param]):
+            f.write("data line {:07d}\n".format(i))
+    return path
+
+
+def test_parse(benchmark, version_config):
+    version = benchmark(version_config.parse, "1.2.3-rc4")
+    assert version["build"].value == "4"
+
+
+def test_bump(benchmark, version_config):
+    version = version_config.parse("1.2.3-rc4")
+    bumped = benchmark(version.bump, "minor", version_config.order())
+    assert bumped["minor"].value == "3"
+
+
+@pytest.mark.parametrize("version_string", ["1.2.3-rc4", "1.2.3"])
+def test_serialize(benchmark, version_config, context, version_string):
+    # the version without pre-release falls back to the second format
+    version = version_config.parse(version_string)
+    assert benchmark(version_config.serialize, version, context) == version_string
+
+
+def test_numeric_function_bump(benchmark):
+    assert benchmark(NumericFunction().bump, "r41-001") == "r42-001"
+
+
+def test_values_function_bump(benchmark):
+    function = ValuesFunction(["alpha", "beta", "rc", "final"])
+    assert benchmark(function.bump, "rc") == "final"
+
+
+def test_contains(benchmark, target_file):
+    # a fresh ConfiguredFile, so reading the file is measured as well
+    assert benchmark(lambda: ConfiguredFile(target_file, None).contains("version = 1.2.3"))
+
+
+@pytest.fixture(scope="module")
+def version_index(target_file):
+    # written well after the file, so it is trusted by its timestamps
+    stat = os.stat(target_file)
+    os.utime(target_file, (stat.st_atime, stat.st_mtime - 10))
+    index = VersionIndex(target_file + ".index")
+    configured_file = ConfiguredFile(target_file, None)
+    if not configured_file.buffer.is_large:
+        index.record(target_file, configured_file.buffer.read(), ["version = 1.2.3"])
+    index.save()
+    return VersionIndex.load(target_file + ".index")
+
+
+def test_contains_with_index(benchmark, target_file, version_index):
+    # compare with test_contains, the same search without an index
+    def contains():
+        configured_file = ConfiguredFile(target_file, None)
+        configured_file.index = version_index
+        return configured_file.contains("version = 1.2.3")
+
+    assert benchmark(contains)
+
+
+def test_replace(benchmark, target_file, version_config, context):
+    current = version_config.parse("1.2.3")
+    new = current.bump("patch", version_config.order())
+
+    def replace():
+        # replacements are only staged, or reported for large files with
+        # dry_run, so the file stays the same for the next round
+        configured_file = ConfiguredFile(target_file, version_config)
+        dry_run = configured_file.buffer.is_large
+        return configured_file.replace(current, new, context.new_child(), dry_run)
+
+    assert benchmark(replace)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Compares parsing and serializing many versions with VersionConfig, which
+parses its formats and regex once, against a subclass redoing that on every
+call like VersionConfig did up to v0.5.11.
+
+Run with: python benchmarks/bench_version_config.py
+"""
+
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+from bumpversion.version_part import VersionConfig, labels_for_format
+
+VERSIONS = 20000
+PARSE = r"""
+    (?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)  # release
+    (\-(?P<release>[a-z]+)(?P<build>\d+))?          # pre-release
+"""
+SERIALIZE = ["{major}.{minor}.{patch}-{release}{build}", "{major}.{minor}.{patch}"]
+
+
+class UncachedVersionConfig(VersionConfig):
+
+    def __init__(self, *args, **kwargs):
+        super(UncachedVersionConfig, self).__init__(*args, **kwargs)
+        self._labels = {}
+
+    def order(self):
+        return labels_for_format(self.serialize_formats[0])
+
+    def parse(self, version_string):
+        self._regexp_one_line = "".join(
+            [l.split("#")[0].strip() for l in self.parse_regex.pattern.splitlines()]
+        )
+        return super(UncachedVersionConfig, self).parse(version_string)
+
+
+def run(config_class, versions):
+    version_config = config_class(PARSE, SERIALIZE, "{current_version}", "{new_version}")
+    for version_string in versions:
+        version = version_config.parse(version_string)
+        version_config.serialize(version.bump("patch", version_config.order()), {})
+
+
+def main():
+    versions = ["{}.{}.{}-rc{}".format(i % 7, i % 13, i, i % 3) for i in range(VERSIONS)]
+    for config_class in (UncachedVersionConfig, VersionConfig):
+        seconds = min(timeit.repeat(lambda: run(config_class, versions), number=1, repeat=3))
+        print("{:<22} {:.3f}s for {} versions".format(config_class.__name__, seconds, VERSIONS))
+
+
+if __name__ == "__main__":
+    main()
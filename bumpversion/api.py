@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bumping versions from Python, without going through command-line arguments.
+
+    from bumpversion.api import bump
+
+    result = bump("minor", dry_run=True)
+    print(result.new_version)
+
+Unlike bumpversion.cli.main, bump() doesn't configure logging: messages
+go to the 'bumpversion' loggers, which are silent unless the application
+sets up logging itself.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import argparse
+from collections import namedtuple
+
+from bumpversion import cli
+from bumpversion.utils import (
+    BackgroundCall,
+    ConfiguredFile,
+    build_context,
+    prefixed_environ,
+    share_file_buffers,
+)
+from bumpversion.version_part import VersionConfig
+
+
+BumpResult = namedtuple(
+    "BumpResult", ["current_version", "new_version", "files", "commit", "tag"]
+)
+BumpResult.__doc__ = """
+The outcome of bump(): the serialized versions, a FileChange per file, the id
+of the commit and the name of the tag, the last two None if none were made.
+"""
+
+FileChange = namedtuple("FileChange", ["path", "changed"])
+FileChange.__doc__ = """
+A file bump() was configured to change and whether it changed (or would have).
+"""
+
+
+def bump(
+        part=None,
+        config=None,
+        dry_run=False,
+        current_version=None,
+        new_version=None,
+        files=(),
+        commit=None,
+        tag=None,
+        allow_dirty=False,
+):
+    """
+    Bumps part of the version in the working directory like the command line
+    does, with settings from config (default: .bumpversion.cfg or setup.cfg)
+    overridden by the arguments that aren't None, and returns a BumpResult.
+
+    Raises ValueError if neither the current version nor either of part or
+    new_version are known.
+    """
+    usable_vcs = cli._determine_usable_vcs()
+    defaults = {}
+    config_file = cli._determine_config_file(config)
+    parser, config_file_exists, config_newlines, part_configs, configured_files = (
+        cli._load_configuration(config_file, config, defaults)
+    )
+
+    settings = dict(cli.DEFAULTS, dry_run=False)
+    settings.update(defaults)
+    overrides = {
+        "current_version": current_version,
+        "new_version": new_version,
+        "commit": commit,
+        "tag": tag,
+    }
+    settings.update((key, value) for key, value in overrides.items() if value is not None)
+    settings["dry_run"] = dry_run or settings["dry_run"]
+    settings["allow_dirty"] = allow_dirty
+    if not part and not settings.get("new_version"):
+        raise ValueError("Either the part to bump or the new version must be given")
+
+    version_config = VersionConfig(
+        parse=settings["parse"],
+        serialize=settings["serialize"],
+        search=settings["search"],
+        replace=settings["replace"],
+        part_configs=part_configs,
+    )
+    file_names = list(files) or settings.get("files", "").split()
+    configured_files.extend(ConfiguredFile(name, version_config) for name in file_names)
+
+    fields = cli._template_fields([], settings, configured_files)
+    vcs_info = {}
+    if cli._needs_vcs_info([], settings, fields):
+        vcs_info = cli._determine_vcs_info(usable_vcs)
+        cli._default_current_version(settings, vcs_info)
+    if not settings.get("current_version"):
+        raise ValueError("The current version is neither given nor in {}".format(config_file))
+    vcs_info.update(cli._determine_vcs_dirty_info(usable_vcs, fields))
+    context = build_context(vcs_info, prefixed_environ(), cli._determine_time_context())
+
+    current = version_config.parse(settings["current_version"])
+    if settings.get("new_version"):
+        new = version_config.parse(settings["new_version"])
+    else:
+        new = current.bump(part, version_config.order())
+        settings["new_version"] = version_config.serialize(new, context)
+
+    dirty_check = BackgroundCall(
+        cli._determine_vcs_dirty, usable_vcs, settings, configured_files, [config_file]
+    )
+    share_file_buffers(configured_files)
+    index = cli._load_index(settings.get("index"), configured_files)
+    vcs = cli._check_files_during_dirty_check(
+        dirty_check, cli._check_files_contain_version, configured_files, current, context
+    )
+    changed = cli._replace_version_in_files(
+        configured_files, current, new, settings["dry_run"], context
+    )
+    cli._update_index(index, configured_files, settings["dry_run"])
+    config_changed = cli._update_config_file(
+        parser, config_file, config_newlines, config_file_exists,
+        settings["new_version"], settings["dry_run"],
+    )
+
+    commit_id = tag_name = None
+    if vcs:
+        args = argparse.Namespace(**settings)
+        touched = cli._touched_paths(configured_files, changed, config_file, config_changed)
+        context = cli._commit_to_vcs(touched, context, vcs, args, current, new)
+        # before tagging, which makes a commit of its own in Mercurial
+        if args.commit and not args.dry_run:
+            commit_id = vcs.current_commit()
+        tag_name = cli._tag_in_vcs(vcs, context, args)
+
+    return BumpResult(
+        current_version=settings["current_version"],
+        new_version=settings["new_version"],
+        files=[FileChange(f.path, c) for f, c in zip(configured_files, changed)],
+        commit=commit_id,
+        tag=tag_name,
+    )
@@ -2,13 +2,11 @@
 from __future__ import unicode_literals
 
 import argparse
-from datetime import datetime
+from collections import OrderedDict, namedtuple
 import io
-import itertools
 import logging
 import os
 import re
-import sre_constants
 import sys
 import warnings
 
@@ -17,9 +15,11 @@ from bumpversion.version_part import (
     VersionConfig,
     NumericVersionPartConfiguration,
     ConfiguredVersionPartConfiguration,
+    fields_in_templates,
 )
 from bumpversion.compat import (
     ConfigParser,
+    format_map,
     StringIO,
     RawConfigParser,
     NoOptionError,
@@ -27,16 +27,25 @@ from bumpversion.compat import (
 from bumpversion.exceptions import (
     IncompleteVersionRepresentationException,
     MissingValueForSerializationException,
+    PlanDoesNotApplyException,
     WorkingDirectoryIsDirtyException,
 )
+from bumpversion.index import VersionIndex
+from bumpversion.plan import apply_files, file_plan, load_plan, save_plan
 
 from bumpversion.utils import (
+    BackgroundCall,
     ConfiguredFile,
+    build_context,
     DiscardDefaultIfSpecifiedAppendAction,
     keyvaluestring,
+    map_in_order,
     prefixed_environ,
+    share_file_buffers,
+    unified_patch,
 )
-from bumpversion.vcs import Git, Mercurial
+from bumpversion.vcs import Git, Mercurial, find_marker
+from bumpversion.walker import find_files
 
 
 DESCRIPTION = "{}: v{} (using Python v{})".format(
@@ -46,34 +55,99 @@ DESCRIPTION = "{}: v{} (using Python v{})".format(
 )
 VCS = [Git, Mercurial]
 
+# used for everything neither given on the command line nor in the config file
+DEFAULTS = {
+    "parse": r"(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)",
+    "serialize": [str("{major}.{minor}.{patch}")],
+    "search": "{current_version}",
+    "replace": "{new_version}",
+    "commit": False,
+    "tag": False,
+    "sign_tags": False,
+    "tag_name": "v{new_version}",
+    "tag_message": "Bump version: {current_version} → {new_version}",
+    "message": "Bump version: {current_version} → {new_version}",
+}
+
 
 logger_list = logging.getLogger("bumpversion.list")
 logger = logging.getLogger(__name__)
-time_context = {"now": datetime.now(), "utcnow": datetime.utcnow()}
+
+# bumpversion.server runs every request in a forked process, so it can share
+# parsed config files and VCS probes between requests by setting these to {}
+_config_cache = None
+_vcs_cache = None
 
 
 OPTIONAL_ARGUMENTS_THAT_TAKE_VALUES = [
+    "--apply",
+    "--batch",
     "--config-file",
     "--current-version",
+    "--dirty-scope",
+    "--index",
+    "--jobs",
     "--message",
     "--new-version",
     "--parse",
+    "--patch",
+    "--plan",
+    "--profile",
     "--serialize",
     "--search",
     "--replace",
     "--tag-name",
     "--tag-message",
+    "-j",
     "-m",
 ]
 
 
+# number of functions in the --profile summary
+PROFILE_SUMMARY_LINES = 25
+
+# template fields only the latest tag info of the VCS knows
+VCS_TAG_FIELDS = {"commit_sha", "distance_to_latest_tag"}
+
+
 def main(original_args=None):
     # determine configuration based on command-line arguments
     # and on-disk configuration files
     args, known_args, root_parser, positionals = _parse_arguments_phase_1(original_args)
+    if known_args.profile:
+        _run_profiled(known_args.profile, _main, args, known_args, root_parser, positionals)
+    else:
+        _main(args, known_args, root_parser, positionals)
+
+
+def _run_profiled(path, func, *args):
+    # writes pstats output to path and a summary of the slowest functions
+    # to stderr, also when func fails
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(PROFILE_SUMMARY_LINES)
+
+
+def _main(args, known_args, root_parser, positionals):
     _setup_logging(known_args.list, known_args.verbose)
-    vcs_info = _determine_vcs_usability()
-    defaults = _determine_current_version(vcs_info)
+    if known_args.apply:
+        if known_args.batch:
+            root_parser.error("--apply cannot be combined with --batch")
+        _main_apply(known_args.apply, _is_dry_run(args))
+        return
+    if known_args.batch:
+        _main_batch(args, root_parser, positionals, known_args)
+        return
+    # probing the VCS overlaps with reading the configuration
+    vcs_probe = BackgroundCall(_determine_usable_vcs)
+    defaults = {}
     explicit_config = None
     if hasattr(known_args, "config_file"):
         explicit_config = known_args.config_file
@@ -81,14 +155,19 @@ def main(original_args=None):
     config, config_file_exists, config_newlines, part_configs, files = _load_configuration(
         config_file, explicit_config, defaults,
     )
+    fields = _template_fields(args, defaults, files)
+    usable_vcs = vcs_probe.result()
+    vcs_info = {}
+    if _needs_vcs_info(args, defaults, fields):
+        vcs_info = _determine_vcs_info(usable_vcs)
+        _default_current_version(defaults, vcs_info)
     known_args, parser2, remaining_argv = _parse_arguments_phase_2(
         args, known_args, defaults, root_parser
     )
     version_config = _setup_versionconfig(known_args, part_configs)
     current_version = version_config.parse(known_args.current_version)
-    context = dict(
-        itertools.chain(time_context.items(), prefixed_environ().items(), vcs_info.items())
-    )
+    vcs_info.update(_determine_vcs_dirty_info(usable_vcs, fields))
+    context = build_context(vcs_info, prefixed_environ(), _determine_time_context())
 
     # calculate the desired new version
     new_version = _assemble_new_version(
@@ -96,29 +175,316 @@ def main(original_args=None):
     )
     args, file_names = _parse_arguments_phase_3(remaining_argv, positionals, defaults, parser2)
     new_version = _parse_new_version(args, new_version, version_config)
+    if known_args.plan or known_args.patch:
+        # the changes are only staged, so they can be written to the plan or patch
+        args.dry_run = True
 
     # replace version in target files
-    vcs = _determine_vcs_dirty(VCS, defaults)
     files.extend(
         ConfiguredFile(file_name, version_config)
         for file_name
         in (file_names or positionals[1:])
     )
-    _check_files_contain_version(files, current_version, context)
-    _replace_version_in_files(files, current_version, new_version, args.dry_run, context)
+    dirty_check = BackgroundCall(_determine_vcs_dirty, usable_vcs, defaults, files, [config_file])
+    for buf in share_file_buffers(files):
+        if known_args.plan or known_args.patch:
+            buf.keep_in_memory()
+    index = _load_index(known_args.index, files)
+    vcs = _check_files_during_dirty_check(
+        dirty_check, _check_files_contain_version, files, current_version, context, known_args.jobs
+    )
+    changed = _replace_version_in_files(
+        files, current_version, new_version, args.dry_run, context, known_args.jobs
+    )
+    _update_index(index, files, args.dry_run)
     _log_list(config, args.new_version)
 
     # store the new version
-    _update_config_file(
+    config_changed = _update_config_file(
         config, config_file, config_newlines, config_file_exists, args.new_version, args.dry_run,
     )
+    touched = _touched_paths(files, changed, config_file, config_changed)
+    _log_touched_paths(touched)
+
+    if known_args.patch:
+        _write_patch(
+            known_args.patch, files, config, config_file, config_newlines, config_changed
+        )
+    if known_args.plan:
+        _write_plan(
+            known_args.plan, files, config, config_file, config_changed, touched,
+            vcs, args, current_version, new_version, context,
+        )
+    if known_args.plan or known_args.patch:
+        return
 
     # commit and tag
     if vcs:
-        context = _commit_to_vcs(files, context, config_file, config_file_exists, vcs, args, current_version, new_version)
+        context = _commit_to_vcs(touched, context, vcs, args, current_version, new_version)
         _tag_in_vcs(vcs, context, args)
 
 
+BatchPackage = namedtuple(
+    "BatchPackage",
+    [
+        "config",
+        "config_file",
+        "config_file_exists",
+        "config_newlines",
+        "args",
+        "files",
+        "current_version",
+        "new_version",
+        "context",
+        "index",
+    ],
+)
+
+
+def _main_batch(args, root_parser, positionals, known_args):
+    # bump every discovered package in one process, sharing the VCS probe,
+    # the dirty check and a single commit
+    if positionals[1:]:
+        root_parser.error("Giving files on the command line is not supported with --batch")
+    if known_args.plan or known_args.patch:
+        # batch mode doesn't stage its changes, it would make them for real
+        root_parser.error("--plan/--patch cannot be combined with --batch")
+    vcs_probe = BackgroundCall(_determine_usable_vcs)
+    config_files = _discover_config_files(known_args.batch)
+    logger.info("Bumping %s packages in batch mode", len(config_files))
+    usable_vcs = vcs_probe.result()
+    # the latest tag info, once the first package needs it
+    vcs_tag_info = []
+    time_context = _determine_time_context()
+    packages = [
+        _load_batch_package(
+            args, root_parser, positionals, config_file, vcs_tag_info, usable_vcs, time_context
+        )
+        for config_file in config_files
+    ]
+
+    dirty_check = BackgroundCall(
+        _determine_vcs_dirty, usable_vcs, _batch_dirty_settings(packages),
+        [f for package in packages for f in package.files], config_files,
+    )
+    share_file_buffers(f for package in packages for f in package.files)
+
+    def check_packages():
+        for package in packages:
+            _check_files_contain_version(
+                package.files, package.current_version, package.context, known_args.jobs
+            )
+
+    vcs = _check_files_during_dirty_check(dirty_check, check_packages)
+    touched = []
+    for package in packages:
+        changed = _replace_version_in_files(
+            package.files, package.current_version, package.new_version,
+            package.args.dry_run, package.context, known_args.jobs,
+        )
+        _update_index(package.index, package.files, package.args.dry_run)
+        _log_list(package.config, package.args.new_version)
+        config_changed = _update_config_file(
+            package.config, package.config_file, package.config_newlines,
+            package.config_file_exists, package.args.new_version, package.args.dry_run,
+        )
+        touched.extend(
+            path
+            for path in _touched_paths(package.files, changed, package.config_file, config_changed)
+            if path not in touched
+        )
+    _log_touched_paths(touched)
+
+    if vcs:
+        contexts = _commit_batch_to_vcs(packages, touched, vcs)
+        for package, context in zip(packages, contexts):
+            _tag_in_vcs(vcs, context, package.args)
+
+
+def _write_plan(
+        path, files, config, config_file, config_changed, touched,
+        vcs, args, current_version, new_version, context,
+):
+    planned = [
+        file_plan(buf.path, buf.original, buf.edits)
+        for buf in share_file_buffers(files)
+        if buf.edits
+    ]
+    if config_changed:
+        config_before = _read_config_text(config_file)
+        planned.append(
+            file_plan(config_file, config_before, [(0, config_before, _config_text(config))])
+        )
+    plan = {
+        "current_version": args.current_version,
+        "new_version": args.new_version,
+        "files": planned,
+        "vcs": None,
+        "commit": None,
+        "tag": None,
+    }
+    if vcs:
+        commit_context = _commit_context(args, current_version, new_version, context)
+        plan["vcs"] = vcs.__name__
+        if args.commit:
+            plan["commit"] = {
+                "message": format_map(args.message, commit_context),
+                "paths": touched,
+            }
+        if args.tag:
+            plan["tag"] = {
+                "name": format_map(args.tag_name, commit_context),
+                "message": format_map(args.tag_message, commit_context),
+                "sign": args.sign_tags,
+            }
+    save_plan(path, plan)
+    logger.info("Wrote plan to change %s files to %s", len(planned), path)
+
+
+def _write_patch(path, files, config, config_file, config_newlines, config_changed):
+    # writes the diff of every file as soon as it's ready, "-" is stdout
+    if path == "-":
+        sys.stdout.flush()
+        out = getattr(sys.stdout, "buffer", None) or sys.stdout.stream
+    else:
+        out = io.open(path, "wb")
+    try:
+        for buf in share_file_buffers(files):
+            if buf.edits:
+                for line in unified_patch(buf.path, buf.original, buf.read(), buf.newlines):
+                    out.write(line.encode("utf-8"))
+        if config_changed:
+            patch = unified_patch(
+                config_file, _read_config_text(config_file), _config_text(config), config_newlines
+            )
+            for line in patch:
+                out.write(line.encode("utf-8"))
+    finally:
+        if path == "-":
+            out.flush()
+        else:
+            out.close()
+
+
+def _is_dry_run(args):
+    # --apply doesn't parse the options of the later phases, but must not
+    # miss this one
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--dry-run", "-n", action="store_true", default=False)
+    return parser.parse_known_args(args)[0].dry_run
+
+
+def _main_apply(path, dry_run):
+    # makes the changes of a plan, checking the files are still as planned,
+    # without reading the configuration or searching the files
+    plan = load_plan(path)
+    logger.info("%s plan %s", "Would apply" if dry_run else "Applying", path)
+    _log_touched_paths(apply_files(plan, dry_run))
+    if not (plan["commit"] or plan["tag"]):
+        return
+
+    vcs = next(
+        (vcs for vcs in _determine_usable_vcs() if vcs.__name__ == plan["vcs"]), None
+    )
+    if vcs is None:
+        raise PlanDoesNotApplyException(
+            "The plan commits or tags in {}, which isn't usable here".format(plan["vcs"])
+        )
+    if plan["commit"]:
+        commit = plan["commit"]
+        logger.info(
+            "%s to %s with message '%s'",
+            "Would commit" if dry_run else "Committing",
+            vcs.__name__,
+            commit["message"],
+        )
+        if not dry_run:
+            vcs.add_paths(commit["paths"])
+            vcs.commit(
+                message=commit["message"],
+                context={
+                    "current_version": plan["current_version"],
+                    "new_version": plan["new_version"],
+                },
+            )
+    if plan["tag"]:
+        tag = plan["tag"]
+        logger.info(
+            "%s '%s' in %s", "Would tag" if dry_run else "Tagging", tag["name"], vcs.__name__
+        )
+        if not dry_run:
+            vcs.tag(tag["sign"], tag["name"], tag["message"])
+
+
+def _discover_config_files(paths):
+    config_files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            config_files.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d not in (".git", ".hg"))
+            if ".bumpversion.cfg" in filenames:
+                config_files.append(
+                    os.path.normpath(os.path.join(dirpath, ".bumpversion.cfg"))
+                )
+    return config_files
+
+
+def _batch_dirty_settings(packages):
+    # the working directory may only be dirty if every package allows that,
+    # and is checked as a whole if any package wants it to be
+    return {
+        "allow_dirty": all(package.args.allow_dirty for package in packages),
+        "dirty_scope": (
+            "files"
+            if all(package.args.dirty_scope == "files" for package in packages)
+            else "all"
+        ),
+    }
+
+
+def _load_batch_package(
+    args, root_parser, positionals, config_file, vcs_tag_info, usable_vcs, time_context
+):
+    root = os.path.dirname(config_file)
+    defaults = {}
+    config, config_file_exists, config_newlines, part_configs, files = _load_configuration(
+        config_file, config_file, defaults, root=root,
+    )
+    fields = _template_fields(args, defaults, files)
+    vcs_info = {}
+    if _needs_vcs_info(args, defaults, fields):
+        if not vcs_tag_info:
+            vcs_tag_info.append(_determine_vcs_info(usable_vcs))
+        vcs_info = dict(vcs_tag_info[0])
+        _default_current_version(defaults, vcs_info)
+    known_args, parser2, remaining_argv = _parse_arguments_phase_2(
+        args, None, defaults, root_parser
+    )
+    version_config = _setup_versionconfig(known_args, part_configs)
+    current_version = version_config.parse(known_args.current_version)
+    vcs_info.update(_determine_vcs_dirty_info(usable_vcs, fields))
+    context = build_context(vcs_info, prefixed_environ(), time_context)
+    new_version = _assemble_new_version(
+        context, current_version, defaults, known_args.current_version, positionals, version_config
+    )
+    package_args, file_names = _parse_arguments_phase_3(
+        remaining_argv, positionals, defaults, parser2
+    )
+    new_version = _parse_new_version(package_args, new_version, version_config)
+    files.extend(
+        ConfiguredFile(os.path.join(root, file_name), version_config)
+        for file_name
+        in file_names
+    )
+    index = _load_index(known_args.index and os.path.join(root, known_args.index), files)
+    return BatchPackage(
+        config, config_file, config_file_exists, config_newlines,
+        package_args, files, current_version, new_version, context, index,
+    )
+
+
 def split_args_in_optional_and_positional(args):
     # manually parsing positional arguments because stupid argparse can't mix
     # positional and optional arguments
@@ -181,6 +547,67 @@ def _parse_arguments_phase_1(original_args):
         help="Don't abort if working directory is dirty",
         required=False,
     )
+    root_parser.add_argument(
+        "--dirty-scope",
+        choices=["all", "files"],
+        default="all",
+        help="Check the whole working directory for changes, or only the files "
+             "to change and the config file",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--batch",
+        metavar="PATH",
+        action="append",
+        default=[],
+        help="Bump all packages given by config files or found below directories, "
+             "using a single commit",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--jobs",
+        "-j",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Number of files to check and rewrite concurrently",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--index",
+        metavar="FILE",
+        default=None,
+        help="Remember where the version is in each file, to find it faster next time",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--patch",
+        metavar="FILE",
+        default=None,
+        help="Check everything, but only write a patch with the changes to FILE, - for stdout",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--plan",
+        metavar="FILE",
+        default=None,
+        help="Check everything, but only write the planned changes to FILE",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--apply",
+        metavar="FILE",
+        default=None,
+        help="Make the changes planned with --plan in FILE",
+        required=False,
+    )
+    root_parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="Profile the run, write pstats output to FILE and a summary to stderr",
+        required=False,
+    )
     known_args, _ = root_parser.parse_known_args(args)
     return args, known_args, root_parser, positionals
 
@@ -202,19 +629,74 @@ def _setup_logging(show_list, verbose):
     logger.debug("Starting %s", DESCRIPTION)
 
 
-def _determine_vcs_usability():
+def _determine_time_context():
+    from datetime import datetime
+
+    return {"now": datetime.now(), "utcnow": datetime.utcnow()}
+
+
+def _determine_usable_vcs():
+    if _vcs_cache is None:
+        return [vcs for vcs in VCS if vcs.is_usable()]
+    key = (
+        os.getcwd(),
+        find_marker(".git"),
+        find_marker(".hg"),
+        tuple(os.environ.get(name) for name in ("PATH", "GIT_DIR", "GIT_WORK_TREE")),
+    )
+    if key not in _vcs_cache:
+        _vcs_cache[key] = [vcs for vcs in VCS if vcs.is_usable()]
+    return _vcs_cache[key]
+
+
+def _determine_vcs_info(usable_vcs):
     vcs_info = {}
-    for vcs in VCS:
-        if vcs.is_usable():
-            vcs_info.update(vcs.latest_tag_info())
+    for vcs in usable_vcs:
+        vcs_info.update(vcs.latest_tag_info())
     return vcs_info
 
 
-def _determine_current_version(vcs_info):
-    defaults = {}
+def _template_fields(args, defaults, files):
+    """
+    Returns the names of the fields used by any template that can be given
+    on the command line, in the configuration or for one of the files.
+    """
+    templates = list(args)
+    for value in defaults.values():
+        templates.extend(value if isinstance(value, list) else [value])
+    for f in files:
+        templates.extend(f.templates())
+    return fields_in_templates(t for t in templates if hasattr(t, "format"))
+
+
+def _needs_vcs_info(args, defaults, fields):
+    # asking the VCS for the latest tag is slow, so only do that if the
+    # current version isn't known otherwise or one of the templates wants to know
+    if fields & VCS_TAG_FIELDS:
+        return True
+    if "current_version" in defaults:
+        return False
+    return not any(
+        arg == "--current-version" or arg.startswith("--current-version=") for arg in args
+    )
+
+
+def _determine_vcs_dirty_info(usable_vcs, fields):
+    # asking the VCS whether the working directory is dirty is slow,
+    # so only do that if one of the templates wants to know
+    if "dirty" not in fields:
+        return {}
+
+    dirty_info = {}
+    for vcs in usable_vcs:
+        dirty_info.update(vcs.dirty_info())
+    return dirty_info
+
+
+def _default_current_version(defaults, vcs_info):
+    # the version in the configuration wins over the one of the latest tag
     if "current_version" in vcs_info:
-        defaults["current_version"] = vcs_info["current_version"]
-    return defaults
+        defaults.setdefault("current_version", vcs_info["current_version"])
 
 
 def _determine_config_file(explicit_config):
@@ -225,7 +707,31 @@ def _determine_config_file(explicit_config):
     return ".bumpversion.cfg"
 
 
-def _load_configuration(config_file, explicit_config, defaults):
+def _load_configuration(config_file, explicit_config, defaults, root=""):
+    if _config_cache is None or not os.path.isfile(config_file):
+        return _read_configuration(config_file, explicit_config, defaults, root)
+
+    with io.open(config_file, "rb") as config_fp:
+        content = config_fp.read()
+    if b"bumpversion:glob:" in content:
+        # the files matching a glob can change any time
+        return _read_configuration(config_file, explicit_config, defaults, root)
+
+    # keyed by content, a rewrite may not change the modification time
+    key = (os.path.abspath(config_file), explicit_config, root)
+    if key not in _config_cache or _config_cache[key][0] != content:
+        config_defaults = {}
+        configuration = _read_configuration(config_file, explicit_config, config_defaults, root)
+        _config_cache[key] = (content, configuration, config_defaults)
+    else:
+        logger.debug("Using cached config file %s", config_file)
+
+    _, configuration, config_defaults = _config_cache[key]
+    defaults.update(config_defaults)
+    return configuration
+
+
+def _read_configuration(config_file, explicit_config, defaults, root=""):
     # setup.cfg supports interpolation - for compatibility we must do the same.
     if os.path.basename(config_file) == "setup.cfg":
         config = ConfigParser("")
@@ -279,7 +785,7 @@ def _load_configuration(config_file, explicit_config, defaults):
         except NoOptionError:
             pass  # no default value then ;)
 
-    for boolvaluename in ("commit", "tag", "dry_run"):
+    for boolvaluename in ("commit", "tag", "dry_run", "allow_dirty"):
         try:
             defaults[boolvaluename] = config.getboolean(
                 "bumpversion", boolvaluename
@@ -289,7 +795,7 @@ def _load_configuration(config_file, explicit_config, defaults):
 
     part_configs = {}
     files = []
-    file_or_part = re.compile("^bumpversion:(file|part):(.+)")
+    file_or_part = re.compile("^bumpversion:(file|glob|part):(.+)")
     for section_name in config.sections():
         section_name_match = file_or_part.match(section_name)
 
@@ -316,8 +822,10 @@ def _load_configuration(config_file, explicit_config, defaults):
                 **section_config
             )
 
-        elif section_prefix == "file":
-            filename = section_value
+        elif section_prefix in ("file", "glob"):
+            excludes = list(
+                filter(None, (x.strip() for x in section_config.pop("exclude", "").splitlines()))
+            )
 
             if "serialize" in section_config:
                 section_config["serialize"] = list(
@@ -332,25 +840,16 @@ def _load_configuration(config_file, explicit_config, defaults):
 
             section_config["part_configs"] = part_configs
 
-            if "parse" not in section_config:
-                section_config["parse"] = defaults.get(
-                    "parse", r"(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)"
-                )
+            for name in ("parse", "serialize", "search", "replace"):
+                if name not in section_config:
+                    section_config[name] = defaults.get(name, DEFAULTS[name])
 
-            if "serialize" not in section_config:
-                section_config["serialize"] = defaults.get(
-                    "serialize", [str("{major}.{minor}.{patch}")]
-                )
-
-            if "search" not in section_config:
-                section_config["search"] = defaults.get(
-                    "search", "{current_version}"
-                )
-
-            if "replace" not in section_config:
-                section_config["replace"] = defaults.get("replace", "{new_version}")
-
-            files.append(ConfiguredFile(filename, VersionConfig(**section_config)))
+            version_config = VersionConfig(**section_config)
+            if section_prefix == "file":
+                filenames = [os.path.join(root, section_value)]
+            else:
+                filenames = find_files(section_value, excludes, root)
+            files.extend(ConfiguredFile(filename, version_config) for filename in filenames)
 
     return config, config_file_exists, config_newlines, part_configs, files
 
@@ -370,28 +869,26 @@ def _parse_arguments_phase_2(args, known_args, defaults, root_parser):
         "--parse",
         metavar="REGEX",
         help="Regex parsing the version string",
-        default=defaults.get(
-            "parse", r"(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)"
-        ),
+        default=defaults.get("parse", DEFAULTS["parse"]),
     )
     parser2.add_argument(
         "--serialize",
         metavar="FORMAT",
         action=DiscardDefaultIfSpecifiedAppendAction,
         help="How to format what is parsed back to a version",
-        default=defaults.get("serialize", [str("{major}.{minor}.{patch}")]),
+        default=defaults.get("serialize", DEFAULTS["serialize"]),
     )
     parser2.add_argument(
         "--search",
         metavar="SEARCH",
         help="Template for complete string to search",
-        default=defaults.get("search", "{current_version}"),
+        default=defaults.get("search", DEFAULTS["search"]),
     )
     parser2.add_argument(
         "--replace",
         metavar="REPLACE",
         help="Template for complete string to replace",
-        default=defaults.get("replace", "{new_version}"),
+        default=defaults.get("replace", DEFAULTS["replace"]),
     )
     known_args, remaining_argv = parser2.parse_known_args(args)
 
@@ -411,8 +908,8 @@ def _setup_versionconfig(known_args, part_configs):
             replace=known_args.replace,
             part_configs=part_configs,
         )
-    except sre_constants.error:
-        # TODO: use re.error here mayhaps, also: should we log?
+    except re.error:
+        # TODO: should we log?
         sys.exit(1)
     return version_config
 
@@ -471,7 +968,7 @@ def _parse_arguments_phase_3(remaining_argv, positionals, defaults, parser2):
         action="store_true",
         dest="commit",
         help="Commit to version control",
-        default=defaults.get("commit", False),
+        default=defaults.get("commit", DEFAULTS["commit"]),
     )
     commitgroup.add_argument(
         "--no-commit",
@@ -485,7 +982,7 @@ def _parse_arguments_phase_3(remaining_argv, positionals, defaults, parser2):
         "--tag",
         action="store_true",
         dest="tag",
-        default=defaults.get("tag", False),
+        default=defaults.get("tag", DEFAULTS["tag"]),
         help="Create a tag in version control",
     )
     taggroup.add_argument(
@@ -501,7 +998,7 @@ def _parse_arguments_phase_3(remaining_argv, positionals, defaults, parser2):
         action="store_true",
         dest="sign_tags",
         help="Sign tags if created",
-        default=defaults.get("sign_tags", False),
+        default=defaults.get("sign_tags", DEFAULTS["sign_tags"]),
     )
     signtagsgroup.add_argument(
         "--no-sign-tags",
@@ -514,25 +1011,21 @@ def _parse_arguments_phase_3(remaining_argv, positionals, defaults, parser2):
         "--tag-name",
         metavar="TAG_NAME",
         help="Tag name (only works with --tag)",
-        default=defaults.get("tag_name", "v{new_version}"),
+        default=defaults.get("tag_name", DEFAULTS["tag_name"]),
     )
     parser3.add_argument(
         "--tag-message",
         metavar="TAG_MESSAGE",
         dest="tag_message",
         help="Tag message",
-        default=defaults.get(
-            "tag_message", "Bump version: {current_version} → {new_version}"
-        ),
+        default=defaults.get("tag_message", DEFAULTS["tag_message"]),
     )
     parser3.add_argument(
         "--message",
         "-m",
         metavar="COMMIT_MSG",
         help="Commit message",
-        default=defaults.get(
-            "message", "Bump version: {current_version} → {new_version}"
-        ),
+        default=defaults.get("message", DEFAULTS["message"]),
     )
     file_names = []
     if "files" in defaults:
@@ -557,13 +1050,20 @@ def _parse_new_version(args, new_version, vc):
     return new_version
 
 
-def _determine_vcs_dirty(possible_vcses, defaults):
-    for vcs in possible_vcses:
-        if not vcs.is_usable():
-            continue
+def _dirty_check_paths(defaults, files, config_files):
+    # None makes the VCS check the whole working directory
+    if defaults.get("dirty_scope") != "files":
+        return None
+    paths = [f.path for f in files]
+    paths.extend(path for path in config_files if os.path.exists(path))
+    return paths
+
 
+def _determine_vcs_dirty(usable_vcs, defaults, files=(), config_files=()):
+    paths = _dirty_check_paths(defaults, files, config_files)
+    for vcs in usable_vcs:
         try:
-            vcs.assert_nondirty()
+            vcs.assert_nondirty(paths)
         except WorkingDirectoryIsDirtyException as e:
             if not defaults["allow_dirty"]:
                 logger.warning(
@@ -577,20 +1077,67 @@ def _determine_vcs_dirty(possible_vcses, defaults):
     return None
 
 
-def _check_files_contain_version(files, current_version, context):
+def _check_files_during_dirty_check(dirty_check, check, *args):
+    """
+    Calls check(*args) while the VCS looks for changes in the working
+    directory in the background, and returns the VCS to commit to.
+    A dirty working directory is reported before any problem check finds.
+    """
+    try:
+        check(*args)
+    except Exception:
+        dirty_check.result()
+        raise
+    return dirty_check.result()
+
+
+def _check_files_contain_version(files, current_version, context, jobs=1):
     # make sure files exist and contain version string
     logger.info(
         "Asserting files %s contain the version string...",
         ", ".join([str(f) for f in files]),
     )
+    map_in_order(
+        lambda f: f.should_contain_version(current_version, context.new_child()),
+        files,
+        jobs,
+    )
+
+
+def _replace_version_in_files(files, current_version, new_version, dry_run, context, jobs=1):
+    # change version string in the staged file contents, then write them out,
+    # returns which files changed
+    changed = [f.replace(current_version, new_version, context.new_child(), dry_run) for f in files]
+    if not dry_run:
+        _flush_files(files, jobs)
+    return changed
+
+
+def _load_index(path, files):
+    # lets the files look up where the version was written to by the last bump
+    if not path:
+        return None
+    index = VersionIndex.load(path)
     for f in files:
-        f.should_contain_version(current_version, context)
+        f.index = index
+    return index
 
 
-def _replace_version_in_files(files, current_version, new_version, dry_run, context):
-    # change version string in files
+def _update_index(index, files, dry_run):
+    # records where the new version is in every file, for the next bump
+    if index is None or dry_run:
+        return
+    replaced = OrderedDict()
     for f in files:
-        f.replace(current_version, new_version, context, dry_run)
+        if f.replaced_with is not None and not f.buffer.is_large:
+            replaced.setdefault(f.buffer, (f.path, []))[1].append(f.replaced_with)
+    for buf, (path, texts) in replaced.items():
+        index.record(path, buf.read(), texts)
+    index.save()
+
+
+def _flush_files(files, jobs=1):
+    map_in_order(lambda buf: buf.flush(), share_file_buffers(files), jobs)
 
 
 def _log_list(config, new_version):
@@ -600,41 +1147,65 @@ def _log_list(config, new_version):
     config.remove_option("bumpversion", "new_version")
 
 
+def _touched_paths(files, changed, config_file, config_changed):
+    # the paths whose content (would have) changed, each once, so unchanged
+    # files keep their modification time and stay out of the commit
+    paths = []
+    for f, file_changed in zip(files, changed):
+        if file_changed and f.path not in paths:
+            paths.append(f.path)
+    if config_changed:
+        paths.append(config_file)
+    return paths
+
+
+def _log_touched_paths(paths):
+    for path in paths:
+        logger_list.info("touched_file=%s", path)
+
+
 def _update_config_file(
         config, config_file, config_newlines, config_file_exists, new_version, dry_run,
 ):
+    # returns whether the config file (would have) changed
     config.set("bumpversion", "current_version", new_version)
-    new_config = StringIO()
     try:
-        write_to_config_file = (not dry_run) and config_file_exists
+        new_config = _config_text(config)
+        config_changed = config_file_exists and _read_config_text(config_file) != new_config
+        write_to_config_file = (not dry_run) and config_changed
 
         logger.info(
             "%s to config file %s:",
             "Would write" if not write_to_config_file else "Writing",
             config_file,
         )
-
-        config.write(new_config)
-        logger.info(new_config.getvalue())
+        logger.info(new_config)
 
         if write_to_config_file:
             with io.open(config_file, "wt", encoding="utf-8", newline=config_newlines) as f:
-                f.write(new_config.getvalue())
+                f.write(new_config)
+        return config_changed
 
     except UnicodeEncodeError:
         warnings.warn(
             "Unable to write UTF-8 to config file, because of an old configparser version. "
             "Update with `pip install --upgrade configparser`."
         )
+        return False
 
 
-def _commit_to_vcs(files, context, config_file, config_file_exists, vcs, args, current_version, new_version):
-    commit_files = [f.path for f in files]
-    if config_file_exists:
-        commit_files.append(config_file)
-    assert vcs.is_usable(), "Did find '{}' unusable, unable to commit.".format(
-        vcs.__name__
-    )
+def _config_text(config):
+    new_config = StringIO()
+    config.write(new_config)
+    return new_config.getvalue()
+
+
+def _read_config_text(config_file):
+    with io.open(config_file, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def _commit_to_vcs(commit_files, context, vcs, args, current_version, new_version):
     do_commit = args.commit and not args.dry_run
     logger.info(
         "%s %s commit",
@@ -649,19 +1220,11 @@ def _commit_to_vcs(files, context, config_file, config_file_exists, vcs, args, c
             vcs.__name__,
         )
 
-        if do_commit:
-            vcs.add_path(path)
-
-    context = {
-        "current_version": args.current_version,
-        "new_version": args.new_version,
-    }
-    context.update(time_context)
-    context.update(prefixed_environ())
-    context.update({'current_' + part: current_version[part].value for part in current_version})
-    context.update({'new_' + part: new_version[part].value for part in new_version})
+    if do_commit:
+        vcs.add_paths(commit_files)
 
-    commit_message = args.message.format(**context)
+    context = _commit_context(args, current_version, new_version, context)
+    commit_message = format_map(args.message, context)
 
     logger.info(
         "%s to %s with message '%s'",
@@ -674,10 +1237,68 @@ def _commit_to_vcs(files, context, config_file, config_file_exists, vcs, args, c
     return context
 
 
+def _commit_context(args, current_version, new_version, file_context):
+    parts = {'current_' + part: current_version[part].value for part in current_version}
+    parts.update({'new_' + part: new_version[part].value for part in new_version})
+    return build_context(
+        parts,
+        prefixed_environ(),
+        {
+            "current_version": args.current_version,
+            "new_version": args.new_version,
+            "now": file_context["now"],
+            "utcnow": file_context["utcnow"],
+        },
+    )
+
+
+def _commit_batch_to_vcs(packages, commit_files, vcs):
+    do_commit = (
+        any(package.args.commit for package in packages)
+        and not any(package.args.dry_run for package in packages)
+    )
+    logger.info(
+        "%s %s commit",
+        "Would prepare" if not do_commit else "Preparing",
+        vcs.__name__,
+    )
+    for path in commit_files:
+        logger.info(
+            "%s changes in file '%s' to %s",
+            "Would add" if not do_commit else "Adding",
+            path,
+            vcs.__name__,
+        )
+
+    if do_commit:
+        vcs.add_paths(commit_files)
+
+    contexts = [
+        _commit_context(
+            package.args, package.current_version, package.new_version, package.context
+        )
+        for package in packages
+    ]
+    commit_message = "\n".join(
+        format_map(package.args.message, context)
+        for package, context in zip(packages, contexts)
+    )
+
+    logger.info(
+        "%s to %s with message '%s'",
+        "Would commit" if not do_commit else "Committing",
+        vcs.__name__,
+        commit_message,
+    )
+    if do_commit:
+        vcs.commit(message=commit_message, context=contexts[0])
+    return contexts
+
+
 def _tag_in_vcs(vcs, context, args):
     sign_tags = args.sign_tags
-    tag_name = args.tag_name.format(**context)
-    tag_message = args.tag_message.format(**context)
+    tag_name = format_map(args.tag_name, context)
+    tag_message = format_map(args.tag_message, context)
     do_tag = args.tag and not args.dry_run
     logger.info(
         "%s '%s' %s in %s and %s",
@@ -689,3 +1310,5 @@ def _tag_in_vcs(vcs, context, args):
     )
     if do_tag:
         vcs.tag(sign_tags, tag_name, tag_message)
+        return tag_name
+    return None
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+A thin client for bumpversion.server: runs bumpversion with the given
+arguments in the server, or in this process if no server is listening.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import json
+import os
+import socket
+import sys
+
+
+def default_socket_path():
+    """
+    Returns $BUMPVERSION_SOCKET, or a socket in the runtime directory of the user.
+    """
+    if os.environ.get("BUMPVERSION_SOCKET"):
+        return os.environ["BUMPVERSION_SOCKET"]
+    directory = os.environ.get("XDG_RUNTIME_DIR")
+    if not directory:
+        import tempfile
+
+        directory = tempfile.gettempdir()
+    return os.path.join(directory, "bumpversion-{}.sock".format(os.getuid()))
+
+
+def send(connection, message):
+    connection.sendall(json.dumps(message).encode("utf-8"))
+    connection.shutdown(socket.SHUT_WR)
+
+
+def receive(connection):
+    chunks = []
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks).decode("utf-8"))
+
+
+def request(args, socket_path=None):
+    """
+    Runs bumpversion with args in the current working directory and
+    environment in the server, returns its exit status and output as
+    {'status': ..., 'stdout': ..., 'stderr': ...}.
+
+    Raises socket.error if no server is listening.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path or default_socket_path())
+        send(connection, {"cwd": os.getcwd(), "args": list(args), "env": dict(os.environ)})
+        return receive(connection)
+    finally:
+        connection.close()
+
+
+def main(original_args=None):
+    args = sys.argv[1:] if original_args is None else original_args
+    try:
+        response = request(args)
+    except socket.error:
+        from bumpversion.cli import main as run_locally
+
+        run_locally(args)
+        return
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if response["status"]:
+        sys.exit(response["status"])
+
+
+if __name__ == "__main__":
+    main()
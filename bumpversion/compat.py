@@ -1,11 +1,12 @@
 import codecs
-import platform
+import os
+import string
 import sys
 
 
 IS_PY2 = sys.version_info[0] == 2
 IS_PY3 = sys.version_info[0] == 3
-IS_WINDOWS = platform.system() == "Windows"
+IS_WINDOWS = sys.platform.startswith("win")
 
 
 def _command_args(args):
@@ -14,6 +15,32 @@ def _command_args(args):
     return args
 
 
+def replace_file(src, dst):
+    """Moves src over dst, replacing dst if it exists"""
+    if IS_PY2:
+        if IS_WINDOWS and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+    else:
+        os.replace(src, dst)  # pylint: disable=no-member
+
+
+def format_map(template, mapping):
+    """Formats template, looking up only the fields it uses in mapping"""
+    if IS_PY2:
+        return string.Formatter().vformat(template, (), mapping)
+    return template.format_map(mapping)  # pylint: disable=no-member
+
+
+def which(command):
+    """Returns the path of the executable command, or None if it's not on PATH"""
+    if IS_PY2:
+        from distutils.spawn import find_executable  # pylint: disable=import-error
+        return find_executable(command)
+    from shutil import which as find_executable  # pylint: disable=no-name-in-module
+    return find_executable(command)
+
+
 if IS_PY2:
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout)
     from StringIO import StringIO  # noqa # pylint: disable=import-error
@@ -22,6 +49,40 @@ if IS_PY2:
         SafeConfigParser as ConfigParser,
         NoOptionError,
     )
+    from collections import Mapping, MutableMapping  # noqa # pylint: disable=no-name-in-module
+
+    class ChainMap(MutableMapping):
+
+        """
+        Minimal backport of collections.ChainMap: lookups go through maps in
+        order, changes only affect the first one.
+        """
+
+        def __init__(self, *maps):
+            self.maps = list(maps) or [{}]
+
+        def __getitem__(self, key):
+            for mapping in self.maps:
+                try:
+                    return mapping[key]
+                except KeyError:
+                    pass
+            raise KeyError(key)
+
+        def __setitem__(self, key, value):
+            self.maps[0][key] = value
+
+        def __delitem__(self, key):
+            del self.maps[0][key]
+
+        def __iter__(self):
+            return iter(set().union(*self.maps))
+
+        def __len__(self):
+            return len(set().union(*self.maps))
+
+        def new_child(self):
+            return ChainMap({}, *self.maps)
 
 elif IS_PY3:
     from io import StringIO  # noqa # pylint: disable=import-error
@@ -32,3 +93,5 @@ elif IS_PY3:
         ConfigParser,
         NoOptionError,
     )
+    from collections import ChainMap  # noqa
+    from collections.abc import Mapping, MutableMapping  # noqa # pylint: disable=import-error
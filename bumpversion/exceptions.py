@@ -16,3 +16,8 @@ class WorkingDirectoryIsDirtyException(Exception):
 class MercurialDoesNotSupportSignedTagsException(Exception):
     def __init__(self, message):
         self.message = message
+
+
+class PlanDoesNotApplyException(Exception):
+    def __init__(self, message):
+        self.message = message
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reads refs and objects of a git repository directly, without running git.
+
+Only what is needed to find the latest tag is supported, everything else
+raises UnsupportedRepository so that callers can ask git itself instead.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import binascii
+import functools
+import io
+import mmap
+import os
+import struct
+import zlib
+
+
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+_INFLATE_STEP = 4096
+
+
+class UnsupportedRepository(Exception):
+    """The repository can't be read without git."""
+
+
+# what reading corrupt or unexpected data raises, e.g. UnicodeDecodeError,
+# or IOError for a pack index without its pack
+_READ_ERRORS = (zlib.error, struct.error, IOError, OSError, ValueError, IndexError, TypeError)
+
+
+def _reading(method):
+    # lets callers fall back to git instead of failing on data we can't read
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except _READ_ERRORS as e:
+            raise UnsupportedRepository("can't read the repository: {}".format(e))
+    return wrapper
+
+
+def _read_text(path):
+    try:
+        with io.open(path, "rb") as f:
+            return f.read().decode("utf-8")
+    except (IOError, OSError):
+        return None
+
+
+def _is_sha(value):
+    return len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+
+def _map(path):
+    with io.open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _byte(data, pos):
+    return ord(data[pos:pos + 1])
+
+
+def _inflate(data, pos, size):
+    # the compressed length isn't stored, so decompress until we have size bytes
+    decompressor = zlib.decompressobj()
+    chunks = []
+    length = 0
+    while length < size:
+        chunk = data[pos:pos + _INFLATE_STEP]
+        if not chunk:
+            raise UnsupportedRepository("truncated object in pack")
+        pos += len(chunk)
+        chunks.append(decompressor.decompress(chunk))
+        length += len(chunks[-1])
+    return b"".join(chunks)[:size]
+
+
+def _apply_delta(base, delta):
+    delta = bytearray(delta)
+    pos = 0
+    # skip the sizes of the source and the result
+    for _ in range(2):
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+
+    result = []
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            result.append(base[offset:offset + (size or 0x10000)])
+        elif op:
+            result.append(bytes(delta[pos:pos + op]))
+            pos += op
+        else:
+            raise UnsupportedRepository("invalid delta instruction")
+    return b"".join(result)
+
+
+def _parse_headers(content):
+    # header lines of a commit or tag object, up to the message
+    headers = []
+    for line in content.split(b"\n"):
+        if not line:
+            break
+        if line.startswith(b" "):
+            continue  # continuation of a multi-line header, like gpgsig
+        key, _, value = line.partition(b" ")
+        headers.append((key.decode("ascii"), value))
+    return headers
+
+
+class _Pack(object):
+
+    """
+    A version 2 pack index and its pack, mapped into memory when first used.
+    """
+
+    def __init__(self, index_path):
+        self._index_path = index_path
+        self._index = None
+        self._data = None
+        self._count = 0
+
+    def _open(self):
+        if self._index is not None:
+            return
+        index = _map(self._index_path)
+        if index[:8] != b"\xfftOc\x00\x00\x00\x02":
+            raise UnsupportedRepository(
+                "{} is not a version 2 pack index".format(self._index_path)
+            )
+        self._count = struct.unpack_from(">I", index, 8 + 255 * 4)[0]
+        self._data = _map(self._index_path[:-len(".idx")] + ".pack")
+        self._index = index
+
+    def find(self, sha):
+        """
+        Returns the offset of the object with the binary sha in the pack, or None.
+        """
+        self._open()
+        index = self._index
+        first = _byte(sha, 0)
+        low = struct.unpack_from(">I", index, 8 + (first - 1) * 4)[0] if first else 0
+        high = struct.unpack_from(">I", index, 8 + first * 4)[0]
+        names = 8 + 256 * 4
+        while low < high:
+            middle = (low + high) // 2
+            candidate = index[names + middle * 20:names + middle * 20 + 20]
+            if candidate < sha:
+                low = middle + 1
+            elif candidate > sha:
+                high = middle
+            else:
+                return self._offset(middle)
+        return None
+
+    def _offset(self, position):
+        offsets = 8 + 256 * 4 + self._count * 24
+        offset = struct.unpack_from(">I", self._index, offsets + position * 4)[0]
+        if offset & 0x80000000:
+            large_offsets = offsets + self._count * 4
+            offset = struct.unpack_from(
+                ">Q", self._index, large_offsets + (offset & 0x7fffffff) * 8
+            )[0]
+        return offset
+
+    def read(self, offset, repository):
+        """
+        Returns the type and content of the object at offset, resolving deltas.
+        """
+        data = self._data
+        deltas = []
+        while True:
+            c = _byte(data, offset)
+            pos = offset + 1
+            object_type = (c >> 4) & 7
+            size = c & 15
+            shift = 4
+            while c & 0x80:
+                c = _byte(data, pos)
+                pos += 1
+                size |= (c & 0x7f) << shift
+                shift += 7
+
+            if object_type in OBJECT_TYPES:
+                content_type = OBJECT_TYPES[object_type]
+                content = _inflate(data, pos, size)
+                break
+            elif object_type == _OFS_DELTA:
+                c = _byte(data, pos)
+                pos += 1
+                distance = c & 0x7f
+                while c & 0x80:
+                    c = _byte(data, pos)
+                    pos += 1
+                    distance = ((distance + 1) << 7) | (c & 0x7f)
+                deltas.append(_inflate(data, pos, size))
+                offset -= distance
+            elif object_type == _REF_DELTA:
+                base = binascii.hexlify(data[pos:pos + 20]).decode("ascii")
+                deltas.append(_inflate(data, pos + 20, size))
+                content_type, content = repository.read_object(base)
+                break
+            else:
+                raise UnsupportedRepository("unknown object type {}".format(object_type))
+
+        for delta in reversed(deltas):
+            content = _apply_delta(content, delta)
+        return content_type, content
+
+
+class GitRepository(object):
+
+    """
+    Read-only access to the refs and objects below a git directory.
+    """
+
+    @_reading
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        common_dir = _read_text(os.path.join(git_dir, "commondir"))
+        if common_dir:
+            common_dir = os.path.normpath(os.path.join(git_dir, common_dir.strip()))
+        self.common_dir = common_dir or git_dir
+
+        config = (_read_text(os.path.join(self.common_dir, "config")) or "").lower()
+        if "refstorage" in config or "objectformat" in config:
+            raise UnsupportedRepository("unsupported ref or object format")
+        if os.path.exists(os.path.join(self.common_dir, "info", "grafts")):
+            raise UnsupportedRepository("history is changed by grafts")
+
+        shallow = _read_text(os.path.join(self.common_dir, "shallow")) or ""
+        self._shallow = set(shallow.split())
+        self._object_dirs = self._read_object_dirs()
+        self._packed_refs = None
+        self._packs = None
+
+    def _read_object_dirs(self):
+        objects = os.path.join(self.common_dir, "objects")
+        dirs = [objects]
+        alternates = _read_text(os.path.join(objects, "info", "alternates")) or ""
+        for line in alternates.splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                dirs.append(os.path.normpath(os.path.join(objects, line)))
+        return dirs
+
+    def _read_packed_refs(self):
+        """
+        Returns the packed refs as {name: (sha, peeled sha or None)}
+        and whether tags without a peeled sha are known to be lightweight.
+        """
+        if self._packed_refs is None:
+            refs = {}
+            fully_peeled = False
+            name = None
+            content = _read_text(os.path.join(self.common_dir, "packed-refs")) or ""
+            for line in content.splitlines():
+                if line.startswith("#"):
+                    traits = line.partition(":")[2].split()
+                    fully_peeled = "peeled" in traits or "fully-peeled" in traits
+                elif line.startswith("^"):
+                    refs[name] = (refs[name][0], line[1:].strip())
+                elif line.strip():
+                    sha, _, name = line.strip().partition(" ")
+                    refs[name] = (sha, None)
+            self._packed_refs = refs, fully_peeled
+        return self._packed_refs
+
+    @_reading
+    def resolve(self, name):
+        """
+        Returns the sha of a ref like 'HEAD' or 'refs/heads/master', following
+        symbolic refs, or None if it doesn't exist (yet).
+        """
+        for _ in range(10):
+            for base in (self.git_dir, self.common_dir):
+                content = _read_text(os.path.join(base, *name.split("/")))
+                if content is not None:
+                    break
+            else:
+                return self._read_packed_refs()[0].get(name, (None, None))[0]
+
+            content = content.strip()
+            if content.startswith("ref:"):
+                name = content[len("ref:"):].strip()
+            elif _is_sha(content):
+                return content
+            else:
+                raise UnsupportedRepository("can't read ref {}".format(name))
+        raise UnsupportedRepository("too many levels of symbolic refs")
+
+    @_reading
+    def tags(self):
+        """
+        Returns [(name, sha, peeled sha or None)] for all tags, sorted by name.
+
+        If the peeled sha is None, the tag may still be annotated.
+        """
+        packed_refs, fully_peeled = self._read_packed_refs()
+        if any(name.startswith("refs/replace/") for name in packed_refs):
+            raise UnsupportedRepository("history is changed by replace refs")
+        if os.path.isdir(os.path.join(self.common_dir, "refs", "replace")):
+            if os.listdir(os.path.join(self.common_dir, "refs", "replace")):
+                raise UnsupportedRepository("history is changed by replace refs")
+
+        tags = {}
+        for name, (sha, peeled) in packed_refs.items():
+            if name.startswith("refs/tags/"):
+                tags[name] = (sha, peeled or (sha if fully_peeled else None))
+
+        tags_dir = os.path.join(self.common_dir, "refs", "tags")
+        for dirpath, _, filenames in os.walk(tags_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = "refs/tags/" + os.path.relpath(path, tags_dir).replace(os.sep, "/")
+                sha = (_read_text(path) or "").strip()
+                if _is_sha(sha):
+                    tags[name] = (sha, None)
+
+        return [
+            (name[len("refs/tags/"):], sha, peeled)
+            for name, (sha, peeled) in sorted(tags.items())
+        ]
+
+    def _find_pack(self, sha):
+        if self._packs is None:
+            self._packs = []
+            for objects in self._object_dirs:
+                pack_dir = os.path.join(objects, "pack")
+                if os.path.isdir(pack_dir):
+                    self._packs.extend(
+                        _Pack(os.path.join(pack_dir, name))
+                        for name in sorted(os.listdir(pack_dir))
+                        if name.endswith(".idx")
+                    )
+        binary_sha = binascii.unhexlify(sha)
+        for pack in self._packs:
+            offset = pack.find(binary_sha)
+            if offset is not None:
+                return pack, offset
+        return None, None
+
+    @_reading
+    def read_object(self, sha):
+        """
+        Returns the type and the content of the object with the given sha.
+        """
+        for objects in self._object_dirs:
+            path = os.path.join(objects, sha[:2], sha[2:])
+            try:
+                with io.open(path, "rb") as f:
+                    raw = zlib.decompress(f.read())
+            except (IOError, OSError):
+                continue
+            header, _, content = raw.partition(b"\0")
+            return header.split(b" ")[0].decode("ascii"), content
+
+        pack, offset = self._find_pack(sha)
+        if pack is None:
+            raise UnsupportedRepository("object {} not found".format(sha))
+        return pack.read(offset, self)
+
+    @_reading
+    def peel(self, sha):
+        """
+        Returns the object an annotated tag points to and the date of the tag,
+        or the sha and None if it isn't a tag.
+        """
+        object_type, content = self.read_object(sha)
+        if object_type != "tag":
+            return sha, None
+        target = None
+        date = 0
+        for key, value in _parse_headers(content):
+            if key == "object":
+                target = value.decode("ascii")
+            elif key == "tagger":
+                try:
+                    date = int(value.rsplit(b" ", 2)[-2])
+                except (IndexError, ValueError):
+                    pass
+        if target is None:
+            raise UnsupportedRepository("tag {} doesn't point to an object".format(sha))
+        return self.peel(target)[0], date
+
+    @_reading
+    def parents(self, sha):
+        if sha in self._shallow:
+            return []
+        object_type, content = self.read_object(sha)
+        if object_type != "commit":
+            raise UnsupportedRepository("{} is not a commit".format(sha))
+        return [
+            value.decode("ascii")
+            for key, value in _parse_headers(content)
+            if key == "parent"
+        ]
+
+    @_reading
+    def describe(self, prefix=""):
+        """
+        Like 'git describe --tags --long --match=<prefix>*', returns the name
+        of the latest tag reachable from HEAD, the number of commits since
+        then and the sha of HEAD, or None if there is no such tag.
+
+        Only linear history is followed, merges raise UnsupportedRepository.
+        """
+        head = self.resolve("HEAD")
+        if head is None:
+            return None
+
+        candidates = {}
+        for name, sha, peeled in self.tags():
+            if name.startswith(prefix):
+                if peeled is None:
+                    peeled = self.peel(sha)[0]
+                candidates.setdefault(peeled, []).append((name, sha, peeled))
+
+        commit = head
+        distance = 0
+        while True:
+            if commit in candidates:
+                return self._best_tag(candidates[commit]), distance, head
+            parents = self.parents(commit)
+            if not parents:
+                return None
+            if len(parents) > 1:
+                raise UnsupportedRepository("can't describe across merge {}".format(commit))
+            commit = parents[0]
+            distance += 1
+
+    def _best_tag(self, tags):
+        # like git, prefer annotated tags, and of those the newest one
+        best = None
+        for name, sha, peeled in tags:
+            annotated = peeled != sha
+            date = self.peel(sha)[1] if annotated else None
+            if best is None or (annotated and (not best[1] or date > best[2])):
+                best = (name, annotated, date)
+        return best[0]
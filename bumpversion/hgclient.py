@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs Mercurial commands through a single `hg serve --cmdserver pipe`
+process, so that Mercurial only starts up once instead of once per command.
+
+Anything that goes wrong with the command server raises
+CommandServerUnavailable, so that callers can run hg itself instead.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import struct
+
+
+class CommandServerUnavailable(Exception):
+    """The command server can't be started or stopped working."""
+
+
+def _pack(data):
+    return struct.pack(">I", len(data)) + data
+
+
+class CommandServer(object):
+
+    """
+    A Mercurial command server for the repository in the current working
+    directory. Commands run relative to the directory it was started in.
+    """
+
+    COMMAND = ["hg", "serve", "--cmdserver", "pipe"]
+
+    def __init__(self):
+        import subprocess
+
+        try:
+            self._process = subprocess.Popen(
+                self.COMMAND, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        except OSError as e:
+            raise CommandServerUnavailable("Can't start the command server: {}".format(e))
+        try:
+            channel, hello = self._read_channel()
+        except CommandServerUnavailable:
+            self.close()
+            raise
+        fields = dict(
+            line.split(b": ", 1) for line in hello.splitlines() if b": " in line
+        )
+        if channel != b"o" or b"runcommand" not in fields.get(b"capabilities", b"").split():
+            self.close()
+            raise CommandServerUnavailable("The command server can't run commands")
+
+    def _read(self, size):
+        data = self._process.stdout.read(size)
+        if len(data) != size:
+            raise CommandServerUnavailable("The command server stopped")
+        return data
+
+    def _read_channel(self):
+        channel = self._read(1)
+        length = struct.unpack(">I", self._read(4))[0]
+        if channel.isupper():
+            # input channels only announce how much they want to read
+            return channel, length
+        return channel, self._read(length)
+
+    def runcommand(self, args):
+        """
+        Runs hg with args (without 'hg' itself) and returns its exit code,
+        output and error output.
+        """
+        data = b"\0".join(arg.encode("utf-8") for arg in args)
+        try:
+            self._process.stdin.write(b"runcommand\n" + _pack(data))
+            self._process.stdin.flush()
+        except (IOError, OSError) as e:
+            raise CommandServerUnavailable("The command server stopped: {}".format(e))
+
+        output, error = [], []
+        while True:
+            channel, data = self._read_channel()
+            if channel == b"o":
+                output.append(data)
+            elif channel == b"e":
+                error.append(data)
+            elif channel == b"r":
+                return struct.unpack(">i", data)[0], b"".join(output), b"".join(error)
+            elif channel in (b"I", b"L"):
+                # nothing is ever typed in, just like with stdin closed
+                self._process.stdin.write(_pack(b""))
+                self._process.stdin.flush()
+            elif channel.isupper():
+                raise CommandServerUnavailable(
+                    "The command server wants unknown channel {}".format(channel.decode())
+                )
+
+    def close(self):
+        try:
+            self._process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self._process.wait()
+        self._process.stdout.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import io
+import logging
+import os
+
+from bumpversion.compat import replace_file
+from bumpversion.utils import content_hash, find_all
+
+
+logger = logging.getLogger(__name__)
+
+# bumped whenever the layout of the index file changes, older indexes are ignored
+INDEX_FORMAT = 2
+
+
+def _occurrences(content, text):
+    # offsets and line numbers of the occurrences str.replace would replace
+    matches = []
+    line = 0
+    counted = 0
+    for offset in find_all(content, text):
+        line += content.count("\n", counted, offset)
+        counted = offset
+        matches.append((offset, line))
+    return matches
+
+
+class VersionIndex(object):
+
+    """
+    Where the versions were written to in each file by the last bump, so the
+    next bump can go straight to them in files that haven't changed since.
+
+    Like the git index, a file whose size and modification time are as
+    recorded counts as unchanged, without reading all of it again. Only
+    files modified too shortly before the index was written to tell by
+    their timestamps are compared by a hash of their content.
+
+    Offsets are counted in characters of the file content as read by
+    FileBuffer, i.e. with newlines translated to '\\n'. The content is read
+    in full either way, a hit only saves searching it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._hashes = {}
+        # when the loaded index was written
+        self._mtime = None
+
+    @classmethod
+    def load(cls, path):
+        """Reads the index at path, an index that can't be read counts as empty."""
+        import json
+
+        index = cls(path)
+        try:
+            with io.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (IOError, OSError):
+            logger.debug("No version index at %s", path)
+            return index
+        except ValueError:
+            logger.warning("Ignoring version index %s, it is not valid JSON", path)
+            return index
+        if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT:
+            logger.warning("Ignoring version index %s, it has an unknown format", path)
+            return index
+        index._entries = data.get("files", {})
+        index._mtime = os.stat(path).st_mtime
+        return index
+
+    def save(self):
+        import json
+        from tempfile import NamedTemporaryFile
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        data = json.dumps(
+            {"format": INDEX_FORMAT, "files": self._entries}, sort_keys=True
+        )
+        target = NamedTemporaryFile("wb", dir=directory, delete=False)
+        try:
+            with target:
+                target.write(data.encode("utf-8"))
+        except Exception:
+            os.remove(target.name)
+            raise
+        replace_file(target.name, self.path)
+
+    def _key(self, path):
+        # paths are relative to the index, so it stays valid from any directory
+        directory = os.path.dirname(os.path.abspath(self.path))
+        return os.path.relpath(os.path.abspath(path), directory).replace(os.sep, "/")
+
+    def _hash(self, path, content):
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] is content:
+            return cached[1]
+        digest = content_hash(content)
+        self._hashes[path] = (content, digest)
+        return digest
+
+    def lookup(self, path, content, text):
+        """
+        Returns the (offset, line) of every occurrence of text in content,
+        if the index has them for exactly this content of the file at path,
+        else None.
+        """
+        entry = self._entries.get(self._key(path))
+        if not entry or text not in entry["matches"]:
+            return None
+        if not self._unchanged(path, content, entry):
+            logger.debug("%s changed since the version index was written", path)
+            return None
+        matches = [tuple(match) for match in entry["matches"][text]]
+        if not matches or any(
+            content[offset:offset + len(text)] != text for offset, _ in matches
+        ):
+            return None
+        return matches
+
+    def _unchanged(self, path, content, entry):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if (stat.st_size, stat.st_mtime) == (entry["size"], entry["mtime"]) and (
+            self._mtime is not None and stat.st_mtime < self._mtime
+        ):
+            return True
+        # racily clean, the file may have changed without its timestamp changing
+        return entry["hash"] == self._hash(path, content)
+
+    def record(self, path, content, texts):
+        """
+        Records where the given texts occur in content, the content of the
+        file at path as it is on disk.
+        """
+        stat = os.stat(path)
+        self._entries[self._key(path)] = {
+            "hash": self._hash(path, content),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "matches": {text: _occurrences(content, text) for text in texts},
+        }
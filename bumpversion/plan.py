@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import io
+import logging
+
+from bumpversion.exceptions import PlanDoesNotApplyException
+from bumpversion.utils import content_hash
+
+
+logger = logging.getLogger(__name__)
+
+# bumped whenever the layout of plan files changes
+PLAN_FORMAT = 1
+
+
+def file_plan(path, original, edits):
+    """
+    Returns the plan for one file: its edits, applicable to the content with
+    the hash of original.
+    """
+    return {
+        "path": path,
+        "hash": content_hash(original),
+        "edits": [[offset, old, new] for offset, old, new in edits],
+    }
+
+
+def save_plan(path, plan):
+    import json
+
+    plan = dict(plan, format=PLAN_FORMAT)
+    with io.open(path, "wb") as f:
+        f.write(json.dumps(plan, indent=2, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+def load_plan(path):
+    import json
+
+    with io.open(path, "rt", encoding="utf-8") as f:
+        plan = json.load(f)
+    if not isinstance(plan, dict) or plan.get("format") != PLAN_FORMAT:
+        raise PlanDoesNotApplyException(
+            "{} is not a plan of this version of bumpversion".format(path)
+        )
+    return plan
+
+
+def _apply_edits(path, content, edits):
+    for offset, old, new in edits:
+        if content[offset:offset + len(old)] != old:
+            raise PlanDoesNotApplyException(
+                "Expected '{}' at offset {} of {}".format(old, offset, path)
+            )
+        content = content[:offset] + new + content[offset + len(old):]
+    return content
+
+
+def apply_files(plan, dry_run=False):
+    """
+    Changes the files as planned, unless dry_run is set. Returns their paths.
+
+    All files are checked against the hashes in the plan before any of them is
+    written, so a plan that doesn't apply changes nothing.
+    """
+    changes = []
+    for planned in plan["files"]:
+        path = planned["path"]
+        with io.open(path, "rt", encoding="utf-8") as f:
+            content = f.read()
+            newlines = f.newlines
+        if content_hash(content) != planned["hash"]:
+            raise PlanDoesNotApplyException(
+                "{} changed since the plan was made".format(path)
+            )
+        changes.append((path, _apply_edits(path, content, planned["edits"]), newlines))
+
+    for path, content, newlines in changes:
+        logger.info("%s file %s", "Would change" if dry_run else "Changing", path)
+        if dry_run:
+            continue
+        with io.open(path, "wt", encoding="utf-8", newline=newlines) as f:
+            f.write(content)
+    return [path for path, _, _ in changes]
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+"""
+A server running bumpversion for clients connecting to a Unix socket.
+
+Every request is read and run in a forked process, which starts with all
+modules imported and with the parsed config files and VCS probes of earlier
+requests; the server parses them once that process passed back its request.
+Requests for the same repository are serialized with a file lock, requests
+for different repositories run concurrently.
+"""
+
+from __future__ import unicode_literals, print_function
+
+import argparse
+import errno
+import hashlib
+import io
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import traceback
+
+from bumpversion import cli
+from bumpversion.client import default_socket_path, receive, send
+from bumpversion.vcs import find_marker
+
+
+logger = logging.getLogger(__name__)
+
+# seconds a client may take to send its request
+REQUEST_TIMEOUT = 10
+
+
+def _option_values(args, option):
+    values = []
+    for i, arg in enumerate(args):
+        if arg == option and i + 1 < len(args):
+            values.append(args[i + 1])
+        elif arg.startswith(option + "="):
+            values.append(arg[len(option) + 1:])
+    return values
+
+
+def _is_cacheable(config_file):
+    # like cli._load_configuration, config files with globs are read every time
+    try:
+        with io.open(config_file, "rb") as f:
+            return b"bumpversion:glob:" not in f.read()
+    except (IOError, OSError):
+        return False
+
+
+def _warm_caches(args):
+    # parsing in the server keeps the results for all later requests;
+    # anything that can't be cached is left to the forked processes, so
+    # it doesn't hold up others
+    cli._determine_usable_vcs()
+    if _option_values(args, "--batch"):
+        # finding the config files walks the directories on every request
+        return
+    explicit_config = (_option_values(args, "--config-file") or [None])[-1]
+    config_file = cli._determine_config_file(explicit_config)
+    if _is_cacheable(config_file):
+        cli._load_configuration(config_file, explicit_config, {})
+
+
+def _check_request(request):
+    if not isinstance(request, dict):
+        raise ValueError("the request is not an object")
+    for key in ("cwd", "env", "args"):
+        if key not in request:
+            raise ValueError("the request has no {}".format(key))
+    if not isinstance(request["cwd"], type("")):
+        raise ValueError("cwd is not a string")
+    if not isinstance(request["env"], dict) or not all(
+        isinstance(value, type("")) for value in request["env"].values()
+    ):
+        raise ValueError("env is not an object of strings")
+    if not isinstance(request["args"], list) or not all(
+        isinstance(arg, type("")) for arg in request["args"]
+    ):
+        raise ValueError("args is not a list of strings")
+
+
+def _repository_root():
+    marker = find_marker(".git") or find_marker(".hg")
+    return os.path.dirname(marker) if marker else os.getcwd()
+
+
+def _run_main(args):
+    try:
+        cli.main(args)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        sys.stderr.write("{}\n".format(e.code))
+        return 1
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _handle_in_child(connection, args, lock_dir):
+    import fcntl
+    import tempfile
+
+    lock_name = hashlib.sha1(_repository_root().encode("utf-8")).hexdigest()
+    with io.open(os.path.join(lock_dir, lock_name), "ab") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+
+        # capture the output of bumpversion and of the VCS it runs
+        outputs = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+        for fd, output in zip((1, 2), outputs):
+            os.dup2(output.fileno(), fd)
+        sys.stdout = io.open(1, "w", encoding="utf-8", closefd=False)
+        sys.stderr = io.open(2, "w", encoding="utf-8", closefd=False)
+
+        status = _run_main(args)
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    response = {"status": status}
+    for name, output in zip(("stdout", "stderr"), outputs):
+        output.seek(0)
+        response[name] = output.read().decode("utf-8", "replace")
+    send(connection, response)
+
+
+def _handle(connection, report, lock_dir):
+    # runs in the forked process, so that a slow client holds up nobody else
+    connection.settimeout(REQUEST_TIMEOUT)
+    try:
+        request = receive(connection)
+    except (socket.timeout, ValueError) as e:
+        logger.warning("Ignoring invalid request: %s", e)
+        return
+    connection.settimeout(None)
+
+    try:
+        _check_request(request)
+        os.chdir(request["cwd"])
+    except (ValueError, OSError) as e:
+        logger.warning("Rejecting request: %s", e)
+        try:
+            send(connection, {"status": 1, "stdout": "", "stderr": "bumpversion: {}\n".format(e)})
+        except socket.error:
+            pass
+        return
+    os.environ.clear()
+    os.environ.update(request["env"])
+
+    # the server warms its caches for later requests with this one
+    send(report, request)
+    report.close()
+    _handle_in_child(connection, request["args"], lock_dir)
+
+
+def _fork_handler(connection, listener, reports, lock_dir):
+    report, child_report = socket.socketpair()
+    if os.fork():
+        child_report.close()
+        reports.append(report)
+        return
+
+    status = 1
+    try:
+        listener.close()
+        report.close()
+        for other in reports:
+            other.close()
+        _handle(connection, child_report, lock_dir)
+        status = 0
+    finally:
+        os._exit(status)  # pylint: disable=protected-access
+
+
+def _warm_caches_from(report):
+    try:
+        request = receive(report)
+    except (socket.error, ValueError):
+        # the request was rejected, or the child died before reading it
+        return
+    finally:
+        report.close()
+
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        _warm_caches(request["args"])
+    except Exception:  # pylint: disable=broad-except
+        # the request reports the error
+        logger.debug("Failed to parse config files for caching", exc_info=True)
+
+
+def _reap_children():
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except OSError as e:
+            if e.errno == errno.ECHILD:
+                return
+            raise
+        if not pid:
+            return
+
+
+def serve(socket_path):
+    """
+    Handles requests on the Unix socket at socket_path until interrupted.
+    """
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except socket.error:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # left over from a server that was killed
+    else:
+        raise RuntimeError("A server is already listening on {}".format(socket_path))
+    finally:
+        probe.close()
+
+    lock_dir = socket_path + ".locks"
+    if not os.path.isdir(lock_dir):
+        os.mkdir(lock_dir, 0o700)
+
+    cli._config_cache = {}
+    cli._vcs_cache = {}
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # only the user running the server may connect
+    umask = os.umask(0o177)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(umask)
+    listener.listen(64)
+    logger.info("Listening on %s", socket_path)
+
+    # sockets on which forked processes pass back the requests they received
+    reports = []
+    try:
+        while True:
+            _reap_children()
+            readable, _, _ = select.select([listener] + reports, [], [], 1)
+            for report in readable:
+                if report is not listener:
+                    reports.remove(report)
+                    _warm_caches_from(report)
+            if listener not in readable:
+                continue
+            connection, _ = listener.accept()
+            try:
+                _fork_handler(connection, listener, reports, lock_dir)
+            finally:
+                connection.close()
+    finally:
+        for report in reports:
+            report.close()
+        listener.close()
+        os.remove(socket_path)
+
+
+def main(original_args=None):
+    parser = argparse.ArgumentParser(
+        prog="bumpversion-server",
+        description="Run bumpversion for clients connecting to a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        default=default_socket_path(),
+        help="Unix socket to listen on (default: %(default)s)",
+    )
+    args = parser.parse_args(original_args)
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    # exit cleanly, removing the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        serve(args.socket)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
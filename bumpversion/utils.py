@@ -3,10 +3,14 @@
 from __future__ import unicode_literals, print_function
 
 from argparse import _AppendAction
-from difflib import unified_diff
+from functools import partial
 import io
 import logging
+import mmap
 import os
+import threading
+
+from bumpversion.compat import ChainMap, Mapping, format_map, replace_file
 
 
 logger = logging.getLogger(__name__)
@@ -32,20 +36,398 @@ def keyvaluestring(d):
     return ", ".join("{}={}".format(k, v) for k, v in sorted(d.items()))
 
 
+class PrefixedEnviron(Mapping):
+
+    """
+    The environment variables as `$NAME` keys, looked up in os.environ only
+    when a template uses them instead of being copied up front.
+    """
+
+    def __getitem__(self, key):
+        if key.startswith("$"):
+            try:
+                return os.environ[key[1:]]
+            except KeyError:
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        return ("${}".format(key) for key in os.environ)
+
+    def __len__(self):
+        return len(os.environ)
+
+
 def prefixed_environ():
-    return {"${}".format(key): value for key, value in os.environ.items()}
+    return PrefixedEnviron()
+
+
+def build_context(*layers):
+    """
+    Layers the given mappings into one context without copying them, values of
+    earlier layers take precedence. Changes only go into a new top layer.
+    """
+    return ChainMap({}, *layers)
+
+
+def _bumpversion_loggers():
+    # filters only see records of their own logger, so every module's logger
+    # gets one, including those of modules added later
+    return [
+        logging.getLogger(name)
+        for name in sorted(logging.Logger.manager.loggerDict)
+        if name == "bumpversion" or name.startswith("bumpversion.")
+    ]
+
+
+class _DeferredLogFilter(logging.Filter):
+
+    """
+    Holds back records logged from worker threads, so they can be replayed
+    in a deterministic order afterwards.
+    """
+
+    def __init__(self):
+        super(_DeferredLogFilter, self).__init__()
+        self._local = threading.local()
+
+    def filter(self, record):
+        records = getattr(self._local, "records", None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+    def call(self, func, item):
+        self._local.records = []
+        try:
+            return self._local.records, func(item), None
+        except Exception as e:  # pylint: disable=broad-except
+            return self._local.records, None, e
+        finally:
+            self._local.records = None
+
+
+class BackgroundCall(object):
+
+    """
+    Calls func(*args) on a thread of its own, so that waiting for the VCS
+    overlaps with whatever is done until the result is needed.
+
+    result() returns what func returned or reraises its exception, and
+    replays its log output then, as if func had only been called at that point.
+    """
+
+    def __init__(self, func, *args):
+        self._deferred = _DeferredLogFilter()
+        self._loggers = _bumpversion_loggers()
+        for background_logger in self._loggers:
+            background_logger.addFilter(self._deferred)
+        self._outcome = None
+        self._thread = threading.Thread(target=self._run, args=(func, args))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args):
+        self._outcome = self._deferred.call(lambda a: func(*a), args)
+
+    def result(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            for background_logger in self._loggers:
+                background_logger.removeFilter(self._deferred)
+            for record in self._outcome[0]:
+                logging.getLogger(record.name).handle(record)
+        _, result, error = self._outcome
+        if error is not None:
+            raise error
+        return result
+
+
+def map_in_order(func, items, jobs=1):
+    """
+    Calls func on every item, concurrently on up to `jobs` threads.
+
+    Log output of the calls is replayed and the first exception is reraised
+    in the order of items, so the outcome looks like that of a sequential run.
+    """
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    from multiprocessing.pool import ThreadPool
+
+    deferred = _DeferredLogFilter()
+    loggers = _bumpversion_loggers()
+    for worker_logger in loggers:
+        worker_logger.addFilter(deferred)
+    pool = ThreadPool(min(jobs, len(items)))
+    try:
+        outcomes = pool.map(partial(deferred.call, func), items)
+    finally:
+        pool.close()
+        pool.join()
+        for worker_logger in loggers:
+            worker_logger.removeFilter(deferred)
+
+    results = []
+    for records, result, error in outcomes:
+        for record in records:
+            logging.getLogger(record.name).handle(record)
+        if error is not None:
+            raise error
+        results.append(result)
+    return results
+
+
+# files of at least this size are searched and rewritten through a memory map,
+# instead of being decoded into memory as a whole
+LARGE_FILE_SIZE = 32 * 1024 * 1024
+
+# size of the pieces in which large files are counted and copied
+_CHUNK_SIZE = 1024 * 1024
+
+
+def find_lines(haystack, search_lines, newline):
+    """
+    Finds the first place where search_lines occur in haystack as consecutive
+    lines: the first search line anywhere within a line, the lines in between
+    exactly, and the last search line anywhere within the line after them.
+
+    haystack may be a string or a memory map, search_lines and newline must be
+    of the same type. Returns the start and end offset of the matching lines,
+    or None.
+    """
+    if len(search_lines) == 1:
+        pos = haystack.find(search_lines[0])
+        if pos < 0:
+            return None
+        return _line_start(haystack, pos, newline), _line_end(haystack, pos, newline)
+
+    middle = newline.join(search_lines[1:-1])
+    separator = newline + middle + newline if search_lines[1:-1] else newline
+
+    pos = haystack.find(separator)
+    while pos >= 0:
+        after = pos + len(separator)
+        if after < len(haystack):
+            start = _line_start(haystack, pos, newline)
+            end = _line_end(haystack, after, newline)
+            if (
+                haystack.find(search_lines[0], start, pos) >= 0
+                and haystack.find(search_lines[-1], after, end) >= 0
+            ):
+                return start, end
+        pos = haystack.find(separator, pos + 1)
+    return None
+
+
+def _line_start(haystack, pos, newline):
+    start = haystack.rfind(newline, 0, pos)
+    return 0 if start < 0 else start + len(newline)
+
+
+def _line_end(haystack, pos, newline):
+    end = haystack.find(newline, pos)
+    return len(haystack) if end < 0 else end
+
+
+def _count_newlines(haystack, end):
+    return sum(
+        haystack[offset:min(offset + _CHUNK_SIZE, end)].count(b"\n")
+        for offset in range(0, end, _CHUNK_SIZE)
+    )
+
+
+def find_all(haystack, sub):
+    """
+    Returns the offsets of the non-overlapping occurrences of sub in haystack,
+    the ones str.replace would replace.
+    """
+    offsets = []
+    pos = haystack.find(sub) if sub else -1
+    while pos >= 0:
+        offsets.append(pos)
+        pos = haystack.find(sub, pos + len(sub))
+    return offsets
+
+
+def content_hash(content):
+    """Returns a hash identifying the decoded content of a file."""
+    import hashlib
+
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def _count_occurrences(haystack, sub):
+    count = 0
+    pos = haystack.find(sub)
+    while pos >= 0:
+        count += 1
+        pos = haystack.find(sub, pos + len(sub))
+    return count
+
+
+def _open_mapped(path):
+    with io.open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _detect_newline(mapped):
+    pos = mapped.find(b"\n")
+    if pos > 0 and mapped[pos - 1:pos] == b"\r":
+        return b"\r\n"
+    return b"\n"
+
+
+class FileBuffer(object):
+
+    """
+    Content of a text file, read from disk at most once and only written
+    back when flushed.
+
+    Files of LARGE_FILE_SIZE or more are never read into the buffer, they are
+    handled through a memory map by ConfiguredFile instead, unless
+    keep_in_memory() was called.
+
+    The staged edits are kept as (offset, old, new), each offset relative to
+    the content after the edits before it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.newlines = None
+        self.original = None
+        self.edits = []
+        self._content = None
+        self._staged = False
+        self._is_large = None
+        self._lock = threading.Lock()
+
+    def keep_in_memory(self):
+        self._is_large = False
+
+    @property
+    def is_large(self):
+        if self._is_large is None:
+            try:
+                self._is_large = os.stat(self.path).st_size >= LARGE_FILE_SIZE
+            except OSError:
+                # let reading the file raise the appropriate error
+                self._is_large = False
+        return self._is_large
+
+    def read(self):
+        with self._lock:
+            if self._content is None:
+                with io.open(self.path, "rt", encoding="utf-8") as f:
+                    self._content = f.read()
+                    self.newlines = f.newlines
+        return self._content
+
+    @property
+    def is_staged(self):
+        return self._staged
+
+    def stage(self, content, edits):
+        if self.original is None:
+            self.original = self._content
+        shift = 0
+        for offset, old, new in edits:
+            self.edits.append((offset + shift, old, new))
+            shift += len(new) - len(old)
+        self._content = content
+        self._staged = True
+
+    def flush(self):
+        if not self._staged:
+            return
+        with io.open(self.path, "wt", encoding="utf-8", newline=self.newlines) as f:
+            f.write(self._content)
+        self._staged = False
+
+
+def unified_patch(path, before, after, newline=None):
+    """
+    Yields the lines of a patch changing the file at path from content before
+    to after, both with newlines translated to '\n', in the format of
+    git diff, so git apply can apply it. newline is the one used in the file.
+    """
+    from difflib import unified_diff
+
+    # None or a tuple if the file has no or mixed newlines
+    if newline not in ("\r\n", "\r", "\n"):
+        newline = "\n"
+    path = os.path.normpath(path).replace(os.sep, "/")
+
+    def lines(content):
+        return [
+            line[:-1] + newline if line.endswith("\n") else line
+            for line in content.splitlines(True)
+        ]
+
+    yield "diff --git a/{0} b/{0}\n".format(path)
+    for line in unified_diff(
+        lines(before), lines(after), fromfile="a/" + path, tofile="b/" + path
+    ):
+        if line.endswith("\n"):
+            yield line
+        else:
+            yield line + "\n"
+            yield "\\ No newline at end of file\n"
+
+
+def share_file_buffers(files):
+    """
+    Lets all ConfiguredFiles pointing to the same file use a single FileBuffer,
+    so each file is read once and sees the replacements staged before.
+
+    Returns the distinct buffers, in order of first appearance.
+    """
+    buffers = {}
+    ordered = []
+    for f in files:
+        key = os.path.normcase(os.path.abspath(f.path))
+        if key not in buffers:
+            buffers[key] = f.buffer
+            ordered.append(f.buffer)
+        f.buffer = buffers[key]
+    return ordered
+
+
+def _splice(content, offsets, length, replacement):
+    pieces = []
+    copied = 0
+    for offset in offsets:
+        pieces.append(content[copied:offset])
+        pieces.append(replacement)
+        copied = offset + length
+    pieces.append(content[copied:])
+    return "".join(pieces)
 
 
 class ConfiguredFile(object):
     def __init__(self, path, versionconfig):
         self.path = path
+        self.buffer = FileBuffer(path)
+        # a VersionIndex to look up where the version is, instead of searching
+        self.index = None
+        # the text replace() put in place of the version, for the index
+        self.replaced_with = None
         self._versionconfig = versionconfig
 
+    def templates(self):
+        """Returns the format strings used to search and replace in this file."""
+        return [self._versionconfig.search, self._versionconfig.replace] + list(
+            self._versionconfig.serialize_formats
+        )
+
     def should_contain_version(self, version, context):
 
         context["current_version"] = self._versionconfig.serialize(version, context)
 
-        serialized_version = self._versionconfig.search.format(**context)
+        serialized_version = format_map(self._versionconfig.search, context)
 
         if self.contains(serialized_version):
             return
@@ -61,54 +443,161 @@ class ConfiguredFile(object):
         assert False, msg
 
     def contains(self, search):
-        with io.open(self.path, "rt", encoding="utf-8") as f:
-            search_lines = search.splitlines()
-            lookbehind = []
-
-            for lineno, line in enumerate(f.readlines()):
-                lookbehind.append(line.rstrip("\n"))
-
-                if len(lookbehind) > len(search_lines):
-                    lookbehind = lookbehind[1:]
-
-                if (
-                    search_lines[0] in lookbehind[0]
-                    and search_lines[-1] in lookbehind[-1]
-                    and search_lines[1:-1] == lookbehind[1:-1]
-                ):
-                    logger.info(
-                        "Found '%s' in %s at line %s: %s",
-                        search,
-                        self.path,
-                        lineno - (len(lookbehind) - 1),
-                        line.rstrip(),
-                    )
-                    return True
-        return False
+        if self.buffer.is_large:
+            return self._contains_mapped(search)
+
+        content = self.buffer.read()
+        matches = self._indexed_matches(content, search)
+        if matches:
+            offset, line = matches[0]
+            end = _line_end(content, offset + len(search.rstrip("\n")), "\n")
+            logger.info(
+                "Found '%s' in %s at line %s: %s",
+                search,
+                self.path,
+                line,
+                content[_line_start(content, end, "\n"):end].rstrip(),
+            )
+            return True
+
+        found = find_lines(content, search.splitlines(), "\n")
+        if found is None:
+            return False
+        start, end = found
+        logger.info(
+            "Found '%s' in %s at line %s: %s",
+            search,
+            self.path,
+            content.count("\n", 0, start),
+            content[_line_start(content, end, "\n"):end].rstrip(),
+        )
+        return True
+
+    def _indexed_matches(self, content, text):
+        # the index only knows about the content as it was read from disk
+        if self.index is None or self.buffer.is_staged:
+            return None
+        return self.index.lookup(self.path, content, text)
+
+    def _contains_mapped(self, search):
+        mapped = _open_mapped(self.path)
+        try:
+            newline = _detect_newline(mapped)
+            found = find_lines(
+                mapped, [l.encode("utf-8") for l in search.splitlines()], newline
+            )
+            if found is None:
+                return False
+            start, end = found
+            logger.info(
+                "Found '%s' in %s at line %s: %s",
+                search,
+                self.path,
+                _count_newlines(mapped, start),
+                mapped[_line_start(mapped, end, newline):end].decode("utf-8").rstrip(),
+            )
+            return True
+        finally:
+            mapped.close()
+
+    def _replace_mapped(self, search_for, replace_with, original, dry_run):
+        # streams the file into a temporary file next to it, replacing all
+        # occurrences, so memory use doesn't depend on the size of the file
+        import shutil
+        from tempfile import NamedTemporaryFile
+
+        mapped = _open_mapped(self.path)
+        try:
+            newline = _detect_newline(mapped)
+            replace_with = replace_with.replace("\n", newline.decode()).encode("utf-8")
+            needle = search_for.replace("\n", newline.decode()).encode("utf-8")
+            # like for smaller files, fall back to the original version when
+            # replacing the search string wouldn't change anything
+            if needle == replace_with or mapped.find(needle) < 0:
+                needle = original.encode("utf-8") if original else b""
+            occurrences = 0
+            if needle and needle != replace_with:
+                occurrences = _count_occurrences(mapped, needle)
+            if not occurrences:
+                # the file isn't rewritten, so its modification time stays
+                logger.info(
+                    "%s file %s", "Would not change" if dry_run else "Not changing", self.path
+                )
+                return False
 
-    def replace(self, current_version, new_version, context, dry_run):
+            logger.info(
+                "%s file %s: %s occurrences of '%s' with '%s'",
+                "Would change" if dry_run else "Changing",
+                self.path,
+                occurrences,
+                needle.decode("utf-8"),
+                replace_with.decode("utf-8"),
+            )
+            if dry_run:
+                return True
+
+            target = NamedTemporaryFile(
+                "wb", dir=os.path.dirname(os.path.abspath(self.path)), delete=False
+            )
+            try:
+                with target:
+                    copied = 0
+                    pos = mapped.find(needle)
+                    while True:
+                        until = len(mapped) if pos < 0 else pos
+                        for offset in range(copied, until, _CHUNK_SIZE):
+                            target.write(mapped[offset:min(offset + _CHUNK_SIZE, until)])
+                        if pos < 0:
+                            break
+                        target.write(replace_with)
+                        copied = pos + len(needle)
+                        pos = mapped.find(needle, copied)
+            except Exception:
+                os.remove(target.name)
+                raise
+        finally:
+            mapped.close()
+
+        shutil.copymode(self.path, target.name)
+        replace_file(target.name, self.path)
+        return True
 
-        with io.open(self.path, "rt", encoding="utf-8") as f:
-            file_content_before = f.read()
-            file_new_lines = f.newlines
+    def replace(self, current_version, new_version, context, dry_run):
+        """Replaces the version in the file, returns whether it (would have) changed."""
 
         context["current_version"] = self._versionconfig.serialize(
             current_version, context
         )
         context["new_version"] = self._versionconfig.serialize(new_version, context)
 
-        search_for = self._versionconfig.search.format(**context)
-        replace_with = self._versionconfig.replace.format(**context)
+        search_for = format_map(self._versionconfig.search, context)
+        replace_with = format_map(self._versionconfig.replace, context)
+        self.replaced_with = replace_with
+
+        if self.buffer.is_large:
+            return self._replace_mapped(
+                search_for, replace_with, current_version.original, dry_run
+            )
+
+        file_content_before = self.buffer.read()
 
-        file_content_after = file_content_before.replace(search_for, replace_with)
+        needle = search_for
+        matches = self._indexed_matches(file_content_before, search_for)
+        if matches:
+            offsets = [offset for offset, _ in matches]
+        else:
+            offsets = find_all(file_content_before, search_for)
+        file_content_after = _splice(file_content_before, offsets, len(needle), replace_with)
 
         if file_content_before == file_content_after:
             # TODO expose this to be configurable
-            file_content_after = file_content_before.replace(
-                current_version.original, replace_with
-            )
+            needle = current_version.original
+            offsets = find_all(file_content_before, needle)
+            file_content_after = _splice(file_content_before, offsets, len(needle), replace_with)
 
         if file_content_before != file_content_after:
+            from difflib import unified_diff
+
             logger.info("%s file %s:", "Would change" if dry_run else "Changing", self.path)
             logger.info(
                 "\n".join(
@@ -126,9 +615,13 @@ class ConfiguredFile(object):
         else:
             logger.info("%s file %s", "Would not change" if dry_run else "Not changing", self.path)
 
-        if not dry_run:
-            with io.open(self.path, "wt", encoding="utf-8", newline=file_new_lines) as f:
-                f.write(file_content_after)
+        # unchanged files aren't written, so their modification time stays;
+        # with dry_run the changes are staged too, but never flushed
+        if file_content_before != file_content_after:
+            self.buffer.stage(
+                file_content_after, [(offset, needle, replace_with) for offset in offsets]
+            )
+        return file_content_before != file_content_after
 
     def __str__(self):
         return self.path
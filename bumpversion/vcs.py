@@ -5,45 +5,170 @@ from __future__ import unicode_literals, print_function
 import errno
 import logging
 import os
-import subprocess
-from tempfile import NamedTemporaryFile
+import sys
+import threading
 
 from bumpversion.exceptions import (
     WorkingDirectoryIsDirtyException,
     MercurialDoesNotSupportSignedTagsException,
 )
-from bumpversion.compat import _command_args
+from bumpversion.compat import _command_args, which
+from bumpversion.gitrepo import GitRepository, UnsupportedRepository
+from bumpversion.hgclient import CommandServer, CommandServerUnavailable
 
 
 logger = logging.getLogger(__name__)
 
+# stay well below the shortest limit for a command line, 32767 characters on Windows
+MAX_COMMAND_LENGTH = 30000
+
+
+def _chunked_command(command, args, max_length=None):
+    """
+    Splits args into as few commands (starting with command) as possible,
+    each of them shorter than max_length characters.
+    """
+    if max_length is None:
+        max_length = MAX_COMMAND_LENGTH
+    base_length = sum(len(arg) + 1 for arg in command)
+    chunk, length = [], base_length
+    for arg in args:
+        if chunk and length + len(arg) + 1 > max_length:
+            yield command + chunk
+            chunk, length = [], base_length
+        chunk.append(arg)
+        length += len(arg) + 1
+    if chunk:
+        yield command + chunk
+
+
+def _check_output(command):
+    import subprocess
+
+    return subprocess.check_output(_command_args(command))
+
+
+def _status_lines(command, paths=None, check_output=_check_output):
+    """
+    Returns the lines a status command prints for the given paths, or for
+    the whole working directory if paths is None.
+    """
+    if paths is None:
+        commands = [command]
+    else:
+        commands = _chunked_command(command + ["--"], list(paths))
+    return [
+        line.strip()
+        for command in commands
+        for line in check_output(command).splitlines()
+        if line.strip()
+    ]
+
+
+def find_marker(name, start=None):
+    """
+    Returns the path of `name` in the directory start (default: the current
+    working directory) or the closest of its parents that contains it.
+    """
+    path = os.path.abspath(start or os.getcwd())
+    while True:
+        candidate = os.path.join(path, name)
+        if os.path.lexists(candidate):
+            return candidate
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _owned_by_other_user(path):
+    # git refuses to work in repositories owned by someone else
+    getuid = getattr(os, "getuid", None)
+    return getuid is not None and os.stat(path).st_uid != getuid()
+
 
 class BaseVCS(object):
 
     _TEST_USABLE_COMMAND = None
     _COMMIT_COMMAND = None
+    _CURRENT_COMMIT_COMMAND = None
 
     @classmethod
     def commit(cls, message, context):
-        with NamedTemporaryFile("wb", delete=False) as f:
-            f.write(message.encode("utf-8"))
+        import subprocess
+
         env = os.environ.copy()
         env[str("HGENCODING")] = str("utf-8")
         for key in ("current_version", "new_version"):
             env[str("BUMPVERSION_" + key.upper())] = str(context[key])
         try:
-            subprocess.check_output(cls._COMMIT_COMMAND + [f.name], env=env)
+            # the message is passed on stdin, so no temporary file is needed
+            process = subprocess.Popen(
+                cls._COMMIT_COMMAND, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+            output, _ = process.communicate(message.encode("utf-8"))
+            if process.returncode:
+                raise subprocess.CalledProcessError(
+                    process.returncode, cls._COMMIT_COMMAND, output=output
+                )
         except subprocess.CalledProcessError as exc:
             err_msg = "Failed to run {}: return code {}, output: {}".format(
                 exc.cmd, exc.returncode, exc.output
             )
             logger.exception(err_msg)
             raise exc
-        finally:
-            os.unlink(f.name)
+
+    @classmethod
+    def add_path(cls, path):
+        cls.add_paths([path])
 
     @classmethod
     def is_usable(cls):
+        # looking for the repository on disk avoids spawning a process, only
+        # when that is inconclusive we ask the VCS itself
+        if not which(cls._TEST_USABLE_COMMAND[0]):
+            return False
+        usable = cls._find_repository()
+        if usable is None:
+            usable = cls._probe_usable()
+        return usable
+
+    @classmethod
+    def dirty_info(cls):
+        """
+        Returns {'dirty': True} if tracked files have been changed, else {}.
+        """
+        return {}
+
+    @staticmethod
+    def _tag_info(tag_name, distance, commit_sha):
+        return {
+            "commit_sha": commit_sha,
+            "distance_to_latest_tag": distance,
+            "current_version": tag_name.lstrip("v"),
+        }
+
+    @classmethod
+    def current_commit(cls):
+        """
+        Returns the id of the commit the working directory is based on.
+        """
+        import subprocess
+
+        return subprocess.check_output(cls._CURRENT_COMMIT_COMMAND).decode("ascii").strip()
+
+    @classmethod
+    def _find_repository(cls):
+        """
+        Returns whether the working directory is inside a repository,
+        or None if that can't be decided without asking the VCS.
+        """
+        return None
+
+    @classmethod
+    def _probe_usable(cls):
+        import subprocess
+
         try:
             return (
                 subprocess.call(
@@ -62,17 +187,53 @@ class BaseVCS(object):
 class Git(BaseVCS):
 
     _TEST_USABLE_COMMAND = ["git", "rev-parse", "--git-dir"]
-    _COMMIT_COMMAND = ["git", "commit", "-F"]
+    _COMMIT_COMMAND = ["git", "commit", "-F", "-"]
+    _CURRENT_COMMIT_COMMAND = ["git", "rev-parse", "HEAD"]
 
     @classmethod
-    def assert_nondirty(cls):
-        lines = [
-            line.strip()
-            for line in subprocess.check_output(
-                ["git", "status", "--porcelain"]
-            ).splitlines()
-            if not line.strip().startswith(b"??")
-        ]
+    def _find_repository(cls):
+        git_dir = cls._git_dir()
+        return git_dir if git_dir in (None, False) else True
+
+    @classmethod
+    def _git_dir(cls):
+        """
+        Returns the git directory of the working directory, False outside of
+        a repository or None if that can't be decided without asking git.
+        """
+        if any(key in os.environ for key in (
+                "GIT_DIR", "GIT_WORK_TREE", "GIT_CEILING_DIRECTORIES")):
+            return None
+
+        marker = find_marker(".git")
+        if marker is None:
+            # might be a bare repository
+            return None if os.path.isfile("HEAD") else False
+
+        git_dir = marker
+        if os.path.isfile(marker):
+            # worktrees and submodules link to their git directory
+            with open(marker, "rb") as f:
+                content = f.read().decode("utf-8", "replace").strip()
+            if not content.startswith("gitdir:"):
+                return None
+            git_dir = os.path.join(os.path.dirname(marker), content[len("gitdir:"):].strip())
+
+        if not os.path.isfile(os.path.join(git_dir, "HEAD")):
+            return None
+        if _owned_by_other_user(marker):
+            return None
+        return git_dir
+
+    @classmethod
+    def assert_nondirty(cls, paths=None):
+        """
+        Raises WorkingDirectoryIsDirtyException if tracked files have been
+        changed, only looking at the given paths if there are any.
+        """
+        # untracked files don't count, so git shouldn't look for them at all;
+        # checking the changed files still benefits from core.fsmonitor
+        lines = _status_lines(["git", "status", "--porcelain", "--untracked-files=no"], paths)
 
         if lines:
             raise WorkingDirectoryIsDirtyException(
@@ -83,17 +244,26 @@ class Git(BaseVCS):
 
     @classmethod
     def latest_tag_info(cls):
-        try:
-            # git-describe doesn't update the git-index, so we do that
-            subprocess.check_output(["git", "update-index", "--refresh"])
+        # reading the refs ourselves is much faster than git describe, which
+        # also refreshes the whole index
+        git_dir = cls._git_dir()
+        if git_dir:
+            try:
+                latest_tag = GitRepository(git_dir).describe("v")
+            except UnsupportedRepository as e:
+                logger.debug("Asking git for the latest tag: %s", e)
+            else:
+                return cls._tag_info(*latest_tag) if latest_tag else {}
+
+        import subprocess
 
+        try:
             # get info about the latest tag in git
             describe_out = (
                 subprocess.check_output(
                     [
                         "git",
                         "describe",
-                        "--dirty",
                         "--tags",
                         "--long",
                         "--abbrev=40",
@@ -102,30 +272,56 @@ class Git(BaseVCS):
                     stderr=subprocess.STDOUT,
                 )
                 .decode()
+                .strip()
                 .split("-")
             )
         except subprocess.CalledProcessError:
             logger.debug("Error when running git describe")
             return {}
 
-        info = {}
+        commit_sha = describe_out.pop().lstrip("g")
+        distance = int(describe_out.pop())
+        return cls._tag_info("-".join(describe_out), distance, commit_sha)
 
-        if describe_out[-1].strip() == "dirty":
-            info["dirty"] = True
-            describe_out.pop()
+    @classmethod
+    def current_commit(cls):
+        git_dir = cls._git_dir()
+        if git_dir:
+            try:
+                head = GitRepository(git_dir).resolve("HEAD")
+            except UnsupportedRepository as e:
+                logger.debug("Asking git for the current commit: %s", e)
+            else:
+                if head:
+                    return head
+        return super(Git, cls).current_commit()
 
-        info["commit_sha"] = describe_out.pop().lstrip("g")
-        info["distance_to_latest_tag"] = int(describe_out.pop())
-        info["current_version"] = "-".join(describe_out).lstrip("v")
+    @classmethod
+    def dirty_info(cls):
+        import subprocess
 
-        return info
+        try:
+            # git-diff-index doesn't update the git-index, so we do that
+            subprocess.call(["git", "update-index", "-q", "--refresh"])
+            returncode = subprocess.call(
+                ["git", "diff-index", "--quiet", "HEAD", "--"],
+                stderr=subprocess.PIPE,
+            )
+        except OSError:
+            return {}
+        return {"dirty": True} if returncode == 1 else {}
 
     @classmethod
-    def add_path(cls, path):
-        subprocess.check_output(_command_args(["git", "add", "--update", path]))
+    def add_paths(cls, paths):
+        import subprocess
+
+        for command in _chunked_command(["git", "add", "--update", "--"], list(paths)):
+            subprocess.check_output(_command_args(command))
 
     @classmethod
     def tag(cls, sign, name, message):
+        import subprocess
+
         command = ["git", "tag", name]
         if sign:
             command += ["-s"]
@@ -137,19 +333,115 @@ class Git(BaseVCS):
 class Mercurial(BaseVCS):
 
     _TEST_USABLE_COMMAND = ["hg", "root"]
-    _COMMIT_COMMAND = ["hg", "commit", "--logfile"]
+    _COMMIT_COMMAND = ["hg", "commit", "--logfile", "-"]
+    _CURRENT_COMMIT_COMMAND = ["hg", "log", "--rev", ".", "--template", "{node}"]
+    # the latest tags starting with v and their distance, one per line, the
+    # parent commit and whether the working directory has changes
+    _WORKING_DIRECTORY_TEMPLATE = (
+        r"{latesttag('re:^v') % '{tag} {distance}\n'}{p1node}\n{if(files, 'dirty')}"
+    )
+
+    # the command server for _server_cwd, None if it couldn't be started there
+    _server = None
+    _server_cwd = None
+    _server_lock = threading.Lock()
+
+    @classmethod
+    def _find_repository(cls):
+        marker = find_marker(".hg")
+        if marker is None:
+            return False
+        if not os.path.isdir(marker):
+            return None
+        return True
+
+    @classmethod
+    def _command_server(cls):
+        import atexit
+
+        cwd = os.getcwd()
+        if cls._server_cwd == cwd:
+            return cls._server
+        if cls._server is not None:
+            cls._server.close()
+        cls._server, cls._server_cwd = None, cwd
+        try:
+            cls._server = CommandServer()
+        except CommandServerUnavailable as e:
+            logger.debug("Running hg without the command server: %s", e)
+            return None
+        atexit.register(cls._server.close)
+        return cls._server
+
+    @classmethod
+    def _output(cls, command):
+        """
+        Returns the output of the hg command, run through the command server
+        of this run so that hg only starts up once, or as a process of its own
+        if there is no command server.
+        """
+        import subprocess
+
+        with cls._server_lock:
+            server = cls._command_server()
+            if server is not None:
+                try:
+                    returncode, output, error = server.runcommand(command[1:])
+                except CommandServerUnavailable as e:
+                    logger.debug("Running hg without the command server: %s", e)
+                    server.close()
+                    cls._server = None
+                else:
+                    if error:
+                        sys.stderr.write(error.decode("utf-8", "replace"))
+                    if returncode:
+                        raise subprocess.CalledProcessError(returncode, command, output=output)
+                    return output
+        return _check_output(command)
+
+    @classmethod
+    def current_commit(cls):
+        return cls._output(cls._CURRENT_COMMIT_COMMAND).decode("ascii").strip()
+
+    @classmethod
+    def _working_directory_info(cls):
+        import subprocess
+
+        # a single hg log of the working directory tells all of it
+        try:
+            output = cls._output(
+                ["hg", "log", "--rev", "wdir()", "--template", cls._WORKING_DIRECTORY_TEMPLATE]
+            )
+        except (subprocess.CalledProcessError, OSError):
+            logger.debug("Error when running hg log")
+            return {}
+
+        lines = output.decode("utf-8").split("\n")
+        tag_name, distance = lines[-3].rsplit(" ", 1)
+        info = {}
+        if tag_name != "null":
+            # the working directory counts as a commit of its own
+            info.update(cls._tag_info(tag_name, int(distance) - 1, lines[-2]))
+        if lines[-1]:
+            info["dirty"] = True
+        return info
 
     @classmethod
     def latest_tag_info(cls):
-        return {}
+        return cls._working_directory_info()
 
     @classmethod
-    def assert_nondirty(cls):
-        lines = [
-            line.strip()
-            for line in subprocess.check_output(["hg", "status", "-mard"]).splitlines()
-            if not line.strip().startswith(b"??")
-        ]
+    def dirty_info(cls):
+        return {"dirty": True} if cls._working_directory_info().get("dirty") else {}
+
+    @classmethod
+    def assert_nondirty(cls, paths=None):
+        """
+        Raises WorkingDirectoryIsDirtyException if tracked files have been
+        changed, only looking at the given paths if there are any.
+        """
+        # -mard leaves out unknown and ignored files
+        lines = _status_lines(["hg", "status", "-mard"], paths, cls._output)
 
         if lines:
             raise WorkingDirectoryIsDirtyException(
@@ -159,7 +451,7 @@ class Mercurial(BaseVCS):
             )
 
     @classmethod
-    def add_path(cls, path):
+    def add_paths(cls, paths):
         pass
 
     @classmethod
@@ -171,4 +463,4 @@ class Mercurial(BaseVCS):
             )
         if message:
             command += ["--message", message]
-        subprocess.check_output(_command_args(command))
+        cls._output(command)
@@ -4,9 +4,9 @@ from __future__ import unicode_literals, print_function
 
 import logging
 import re
-import sre_constants
 import string
 
+from bumpversion.compat import ChainMap, format_map
 from bumpversion.exceptions import (
     MissingValueForSerializationException,
     IncompleteVersionRepresentationException,
@@ -131,6 +131,26 @@ def labels_for_format(serialize_format):
     )
 
 
+def fields_in_templates(templates):
+    """
+    Returns the names of all fields used by the format strings, including
+    the ones in nested format specs. Invalid format strings are skipped.
+    """
+    fields = set()
+    templates = list(templates)
+    while templates:
+        try:
+            parsed = list(string.Formatter().parse(templates.pop()))
+        except ValueError:
+            continue
+        for _, field_name, format_spec, _ in parsed:
+            if field_name:
+                fields.add(re.split(r"[.\[]", field_name, 1)[0])
+            if format_spec:
+                templates.append(format_spec)
+    return fields
+
+
 class VersionConfig(object):
 
     """
@@ -141,8 +161,7 @@ class VersionConfig(object):
 
         try:
             self.parse_regex = re.compile(parse, re.VERBOSE)
-        except sre_constants.error as e:
-            # TODO: use re.error here mayhaps
+        except re.error as e:
             logger.error("--parse '%s' is not a valid regex", parse)
             raise e
 
@@ -155,24 +174,30 @@ class VersionConfig(object):
         self.search = search
         self.replace = replace
 
-
-    def order(self):
+        # parsing the formats and the regex once makes parsing and serializing
+        # many versions much faster
+        self._labels = {
+            serialize_format: frozenset(labels_for_format(serialize_format))
+            for serialize_format in serialize
+        }
         # currently, order depends on the first given serialization format
         # this seems like a good idea because this should be the most complete format
-        return labels_for_format(self.serialize_formats[0])
+        self._order = tuple(labels_for_format(serialize[0]))
+        self._regexp_one_line = "".join(
+            [l.split("#")[0].strip() for l in self.parse_regex.pattern.splitlines()]
+        )
+
+    def order(self):
+        return self._order
 
     def parse(self, version_string):
         if not version_string:
             return None
 
-        regexp_one_line = "".join(
-            [l.split("#")[0].strip() for l in self.parse_regex.pattern.splitlines()]
-        )
-
         logger.info(
             "Parsing version '%s' using regexp '%s'",
             version_string,
-            regexp_one_line,
+            self._regexp_one_line,
         )
 
         match = self.parse_regex.search(version_string)
@@ -201,15 +226,14 @@ class VersionConfig(object):
 
         Raises MissingValueForSerializationException if not serializable
         """
-        values = context.copy()
-        for k in version:
-            values[k] = version[k]
+        # the version parts are layered over the context instead of copying it
+        values = ChainMap({k: version[k] for k in version}, context)
 
         # TODO dump complete context on debug level
 
         try:
             # test whether all parts required in the format have values
-            serialized = serialize_format.format(**values)
+            serialized = format_map(serialize_format, values)
 
         except KeyError as e:
             missing_key = getattr(e, "message", e.args[0])
@@ -236,7 +260,9 @@ class VersionConfig(object):
             elif not found_required:
                 keys_needing_representation.add(k)
 
-        required_by_format = set(labels_for_format(serialize_format))
+        required_by_format = self._labels.get(serialize_format)
+        if required_by_format is None:
+            required_by_format = frozenset(labels_for_format(serialize_format))
 
         # try whether all parsed keys are represented
         if raise_if_incomplete:
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import errno
+import logging
+import os
+import re
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# directories that are never searched for files matching a glob
+SKIPPED_DIRECTORIES = frozenset([
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    "__pycache__",
+    "node_modules",
+    "vendor",
+])
+
+
+def translate_glob(pattern):
+    """
+    Translates a glob pattern into a regex matching paths separated by '/'.
+
+    '*' and '?' don't match '/', '**/' matches any number of directories
+    and a trailing '**' matches everything below a directory.
+    """
+    i, n = 0, len(pattern)
+    regex = []
+    while i < n:
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i) and i + 2 == n:
+            regex.append(".*")
+            i += 2
+            continue
+
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            regex.append("[^/]*")
+        elif c == "?":
+            regex.append("[^/]")
+        elif c == "[":
+            # like fnmatch, a ']' directly after '[' or '[!' is part of the set
+            j = i + 1 if pattern[i:i + 1] == "!" else i
+            j = j + 1 if pattern[j:j + 1] == "]" else j
+            end = pattern.find("]", j)
+            if end < 0:
+                regex.append(re.escape(c))
+            else:
+                chars = pattern[i:end].replace("\\", "\\\\")
+                if chars.startswith("!"):
+                    chars = "^" + chars[1:]
+                elif chars.startswith("^"):
+                    chars = "\\" + chars
+                regex.append("[{}]".format(chars))
+                i = end + 1
+        else:
+            regex.append(re.escape(c))
+    return "(?s)" + "".join(regex) + r"\Z"
+
+
+def _literal_prefix(pattern):
+    # leading directories of the pattern that don't contain any wildcards
+    prefix = []
+    for segment in pattern.split("/")[:-1]:
+        if any(c in segment for c in "*?["):
+            break
+        prefix.append(segment)
+    return "/".join(prefix)
+
+
+def _skipped_directories(pattern):
+    # directories named literally in the pattern are searched nonetheless
+    return SKIPPED_DIRECTORIES.difference(pattern.split("/")[:-1])
+
+
+def _is_skipped(relative_path, skipped):
+    return any(part in skipped for part in relative_path.split("/")[:-1])
+
+
+def _git_files(root, prefix):
+    # lists tracked and untracked, but not ignored files, or None outside of git
+    import subprocess
+
+    try:
+        output = subprocess.check_output(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard",
+             "--", prefix or "."],
+            cwd=root or None,
+            stderr=subprocess.PIPE,
+        )
+    except subprocess.CalledProcessError:
+        return None
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.EACCES):
+            return None
+        raise
+    return sorted(set(
+        path for path in output.decode("utf-8").split("\0") if path
+    ))
+
+
+def _walked_files(root, prefix, skipped):
+    top = os.path.join(root, prefix) if prefix else (root or os.curdir)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(top):
+        dirnames[:] = [d for d in dirnames if d not in skipped]
+        relative_dir = os.path.relpath(dirpath, root or os.curdir).replace(os.sep, "/")
+        for filename in filenames:
+            if relative_dir == ".":
+                files.append(filename)
+            else:
+                files.append(relative_dir + "/" + filename)
+    return sorted(files)
+
+
+def find_files(pattern, excludes=(), root=""):
+    """
+    Returns the paths below root (joined with root) matching the glob pattern,
+    but none of the exclude patterns, in sorted order.
+
+    Inside a git working tree, only files not ignored by git are considered.
+    """
+    started = time.time()
+    include = re.compile(translate_glob(pattern))
+    exclude = [re.compile(translate_glob(p)) for p in excludes]
+    prefix = _literal_prefix(pattern)
+    skipped = _skipped_directories(pattern)
+
+    candidates = _git_files(root, prefix)
+    source = "git"
+    if candidates is None:
+        candidates = _walked_files(root, prefix, skipped)
+        source = "walking the file system"
+
+    matches = [
+        os.path.join(root, *path.split("/"))
+        for path in candidates
+        if include.match(path)
+        and not _is_skipped(path, skipped)
+        and not any(e.match(path) for e in exclude)
+    ]
+    # git also lists files that have been deleted from the working tree
+    matches = [path for path in matches if os.path.isfile(path)]
+
+    if not matches:
+        logger.warning("No files match '%s'", pattern)
+    logger.info(
+        "Found %s files matching '%s' in %.3fs using %s",
+        len(matches),
+        pattern,
+        time.time() - started,
+        source,
+    )
+    return matches
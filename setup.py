@@ -25,6 +25,8 @@ setup(
         'console_scripts': [
             'bumpversion = bumpversion.cli:main',
             'bump2version = bumpversion.cli:main',
+            'bumpversion-server = bumpversion.server:main',
+            'bumpversion-client = bumpversion.client:main',
         ]
     },
     python_requires='>=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*',
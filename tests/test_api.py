@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import logging
+import subprocess
+
+import pytest
+
+from bumpversion.api import FileChange, bump
+
+
+CONFIG = """[bumpversion]
+current_version = 0.1.0
+
+[bumpversion:file:VERSION]
+
+[bumpversion:file:README]
+"""
+
+
+@pytest.fixture
+def package(tmpdir):
+    tmpdir.join(".bumpversion.cfg").write(CONFIG)
+    tmpdir.join("VERSION").write("0.1.0")
+    tmpdir.join("README").write("Version 0.1.0")
+    tmpdir.chdir()
+    return tmpdir
+
+
+def test_bump(package):
+    root_logger = logging.getLogger()
+    level, handlers = root_logger.level, list(root_logger.handlers)
+
+    result = bump("minor")
+
+    assert result.current_version == "0.1.0"
+    assert result.new_version == "0.2.0"
+    assert result.files == [FileChange("VERSION", True), FileChange("README", True)]
+    assert (result.commit, result.tag) == (None, None)
+    assert "0.2.0" == package.join("VERSION").read()
+    assert "current_version = 0.2.0" in package.join(".bumpversion.cfg").read()
+    assert (root_logger.level, root_logger.handlers) == (level, handlers)
+
+
+def test_bump_dry_run_with_new_version(package):
+    package.join("OTHER").write("0.1.0")
+    result = bump(new_version="1.0.0", files=["OTHER"], dry_run=True)
+
+    assert result.new_version == "1.0.0"
+    assert result.files[-1] == FileChange("OTHER", True)
+    assert "0.1.0" == package.join("OTHER").read()
+    assert CONFIG == package.join(".bumpversion.cfg").read()
+
+
+def test_bump_needs_a_current_version(tmpdir):
+    tmpdir.chdir()
+    with pytest.raises(ValueError):
+        bump("patch")
+
+
+@pytest.mark.xfail(subprocess.call(["git", "version"]) != 0, reason="git is not installed")
+def test_bump_commit_and_tag(package):
+    subprocess.check_call(["git", "init"])
+    subprocess.check_call(["git", "add", "."])
+    subprocess.check_call(["git", "commit", "-m", "initial commit"])
+
+    result = bump("patch", commit=True, tag=True)
+
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"]).decode("ascii").strip()
+    assert result.commit == head
+    assert result.tag == "v0.1.1"
+    assert "v0.1.1" == subprocess.check_output(["git", "tag"]).decode("ascii").strip()
+
+
+@pytest.mark.xfail(subprocess.call(["hg", "version"]) != 0, reason="hg is not installed")
+def test_bump_commit_and_tag_in_mercurial(package):
+    subprocess.check_call(["hg", "init"])
+    subprocess.check_call(["hg", "add", "."])
+    subprocess.check_call(["hg", "commit", "-m", "initial commit"])
+
+    result = bump("patch", commit=True, tag=True)
+
+    # the tag is a commit of its own, on top of the bump
+    bump_commit = subprocess.check_output(
+        ["hg", "log", "--rev", "tip~1", "--template", "{node}"]
+    ).decode("ascii")
+    assert result.commit == bump_commit
+    assert result.tag == "v0.1.1"
+    assert "v0.1.1" in subprocess.check_output(["hg", "tags"]).decode("ascii")
@@ -3,6 +3,7 @@
 from __future__ import unicode_literals, print_function
 
 import argparse
+import io
 import logging
 import os
 import platform
@@ -20,6 +21,7 @@ from testfixtures import LogCapture
 import bumpversion
 from bumpversion.compat import RawConfigParser
 from bumpversion.exceptions import WorkingDirectoryIsDirtyException
+from bumpversion.vcs import Git, Mercurial
 from bumpversion.cli import DESCRIPTION, main, split_args_in_optional_and_positional
 
 
@@ -95,6 +97,14 @@ EXPECTED_OPTIONS = r"""
 [--verbose]
 [--list]
 [--allow-dirty]
+[--dirty-scope {all,files}]
+[--batch PATH]
+[--jobs N]
+[--index FILE]
+[--patch FILE]
+[--plan FILE]
+[--apply FILE]
+[--profile FILE]
 [--parse REGEX]
 [--serialize FORMAT]
 [--search SEARCH]
@@ -128,6 +138,23 @@ optional arguments:
   --list                List machine readable information (default: False)
   --allow-dirty         Don't abort if working directory is dirty (default:
                         False)
+  --dirty-scope {all,files}
+                        Check the whole working directory for changes, or only
+                        the files to change and the config file (default: all)
+  --batch PATH          Bump all packages given by config files or found below
+                        directories, using a single commit (default: [])
+  --jobs N, -j N        Number of files to check and rewrite concurrently
+                        (default: 1)
+  --index FILE          Remember where the version is in each file, to find it
+                        faster next time (default: None)
+  --patch FILE          Check everything, but only write a patch with the
+                        changes to FILE, - for stdout (default: None)
+  --plan FILE           Check everything, but only write the planned changes
+                        to FILE (default: None)
+  --apply FILE          Make the changes planned with --plan in FILE (default:
+                        None)
+  --profile FILE        Profile the run, write pstats output to FILE and a
+                        summary to stderr (default: None)
   --parse REGEX         Regex parsing the version string (default:
                         (?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+))
   --serialize FORMAT    How to format what is parsed back to a version
@@ -433,6 +460,53 @@ def test_dirty_work_dir(tmpdir, vcs):
     )
 
 
+def test_dirty_scope_files_ignores_other_changes(tmpdir, vcs):
+    tmpdir.chdir()
+    check_call([vcs, "init"])
+    tmpdir.join("VERSION").write("1.1.1")
+    tmpdir.join("other").write("unrelated")
+    check_call([vcs, "add", "VERSION", "other"])
+    check_call([vcs, "commit", "-m", "initial commit"])
+    tmpdir.join("other").write("unrelated change")
+
+    with pytest.raises(WorkingDirectoryIsDirtyException):
+        main(['patch', '--current-version', '1.1.1', 'VERSION'])
+
+    main(['patch', '--dirty-scope', 'files', '--current-version', '1.1.1', 'VERSION'])
+
+    assert "1.1.2" == tmpdir.join("VERSION").read()
+
+
+def test_dirty_scope_files_checks_configured_files(tmpdir, vcs):
+    tmpdir.chdir()
+    check_call([vcs, "init"])
+    tmpdir.join("VERSION").write("1.1.1")
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 1.1.1
+        dirty_scope = files
+
+        [bumpversion:file:VERSION]
+        """).strip())
+    check_call([vcs, "add", "VERSION", ".bumpversion.cfg"])
+    check_call([vcs, "commit", "-m", "initial commit"])
+    tmpdir.join("VERSION").write("1.1.1 changed")
+
+    with pytest.raises(WorkingDirectoryIsDirtyException):
+        main(['patch'])
+
+    assert "1.1.1 changed" == tmpdir.join("VERSION").read()
+
+
+def test_untracked_files_are_not_listed():
+    with mock.patch("subprocess.check_output", return_value=b"") as mocked:
+        Git.assert_nondirty(["VERSION"])
+
+    assert mocked.call_args[0][0] == [
+        "git", "status", "--porcelain", "--untracked-files=no", "--", "VERSION"
+    ]
+
+
 def test_force_dirty_work_dir(tmpdir, vcs):
     tmpdir.chdir()
     check_call([vcs, "init"])
@@ -679,6 +753,80 @@ def test_distance_to_latest_tag_as_part_of_new_version(tmpdir, git):
     assert '19.6.1-pre3' == tmpdir.join("my_source_file").read()
 
 
+@pytest.mark.parametrize("hg", [VCS_MERCURIAL])
+def test_current_version_and_distance_from_mercurial_tag(tmpdir, hg):
+    tmpdir.join("my_source_file").write("19.6.0")
+    tmpdir.chdir()
+
+    check_call([hg, "init"])
+    check_call([hg, "add", "my_source_file"])
+    check_call([hg, "commit", "-m", "initial"])
+    check_call([hg, "tag", "v19.6.0"])
+    tmpdir.join("other").write("other")
+    check_call([hg, "add", "other"])
+    check_call([hg, "commit", "-m", "Just a commit"])
+    tmpdir.join("other").write("changed")
+
+    main([
+         'patch',
+         '--allow-dirty',
+         '--parse', r'(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+).*',
+         '--serialize', '{major}.{minor}.{patch}-pre{distance_to_latest_tag}',
+         '--replace', '{new_version} {commit_sha:.12} dirty={dirty}',
+         'my_source_file',
+         ])
+
+    commit_sha = check_output([hg, "log", "--rev", ".", "--template", "{node|short}"]).decode()
+    assert '19.6.1-pre2 {} dirty=True'.format(commit_sha) == tmpdir.join("my_source_file").read()
+
+
+def test_dirty_is_only_determined_for_templates_using_it(tmpdir, git):
+    tmpdir.join("VERSION").write("1.0.0")
+    tmpdir.chdir()
+    check_call([git, "init"])
+    check_call([git, "add", "VERSION"])
+    check_call([git, "commit", "-m", "initial"])
+    check_call([git, "tag", "v1.0.0"])
+    tmpdir.join("VERSION").write("1.0.0 changed")
+
+    with mock.patch("bumpversion.vcs.Git.dirty_info", return_value={}) as mocked:
+        main(['patch', '--allow-dirty', 'VERSION'])
+    assert not mocked.called
+
+    main([
+        'patch',
+        '--current-version', '1.0.1',
+        '--allow-dirty',
+        '--replace', '{new_version} dirty={dirty}',
+        'VERSION',
+    ])
+    assert "1.0.2 dirty=True changed" == tmpdir.join("VERSION").read()
+
+
+def test_latest_tag_is_only_determined_if_needed(tmpdir, git):
+    tmpdir.join("VERSION").write("1.0.0")
+    tmpdir.chdir()
+    check_call([git, "init"])
+    check_call([git, "add", "VERSION"])
+    check_call([git, "commit", "-m", "initial"])
+    check_call([git, "tag", "v1.0.0"])
+
+    with mock.patch("bumpversion.vcs.Git.latest_tag_info", return_value={}) as mocked:
+        main(['patch', '--current-version', '1.0.0', '--allow-dirty', 'VERSION'])
+    assert not mocked.called
+    assert "1.0.1" == tmpdir.join("VERSION").read()
+
+    main([
+        'patch',
+        '--current-version', '1.0.1',
+        '--allow-dirty',
+        '--replace', '{new_version}+{commit_sha:.7}',
+        'VERSION',
+    ])
+    commit_sha = check_output([git, "rev-parse", "HEAD"]).decode().strip()
+    assert "1.0.2+" + commit_sha[:7] == tmpdir.join("VERSION").read()
+
+
 def test_override_vcs_current_version(tmpdir, git):
     # prepare
     tmpdir.join("contains_actual_version").write("6.7.8")
@@ -998,6 +1146,124 @@ def test_commit_and_tag_from_below_vcs_root(tmpdir, vcs, monkeypatch):
     assert '31.0.0' == tmpdir.join("VERSION").read()
 
 
+def test_batch_mode(tmpdir):
+    tmpdir.chdir()
+    for package, version in (("alpha", "1.0.0"), ("beta", "2.3.4")):
+        tmpdir.mkdir(package).join("VERSION").write(version)
+        tmpdir.join(package, ".bumpversion.cfg").write(dedent("""
+            [bumpversion]
+            current_version = {}
+            [bumpversion:file:VERSION]
+            """.format(version)).strip())
+
+    main(['--batch', '.', 'minor'])
+
+    assert '1.1.0' == tmpdir.join("alpha", "VERSION").read()
+    assert '2.4.0' == tmpdir.join("beta", "VERSION").read()
+    assert 'current_version = 2.4.0' in tmpdir.join("beta", ".bumpversion.cfg").read()
+
+
+@pytest.mark.parametrize("option", ["--plan", "--patch"])
+def test_batch_mode_rejects_dry_run_options(tmpdir, option):
+    tmpdir.chdir()
+    tmpdir.mkdir("pkg").join("VERSION").write("1.0.0")
+    tmpdir.join("pkg", ".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 1.0.0
+        [bumpversion:file:VERSION]
+        """).strip())
+
+    with pytest.raises(SystemExit):
+        main(['--batch', 'pkg', option, 'out', 'patch'])
+
+    assert '1.0.0' == tmpdir.join("pkg", "VERSION").read()
+    assert not tmpdir.join("out").check()
+
+
+@pytest.mark.parametrize("setting, dirty", [
+    ("allow_dirty = True", "other"),
+    ("dirty_scope = files", "other"),
+    ("dirty_scope = files", "alpha/VERSION"),
+])
+def test_batch_mode_honors_dirty_settings_of_packages(tmpdir, git, setting, dirty):
+    tmpdir.chdir()
+    check_call([git, "init"])
+    tmpdir.join("other").write("unrelated")
+    for package in ("alpha", "beta"):
+        tmpdir.mkdir(package).join("VERSION").write("1.0.0")
+        tmpdir.join(package, ".bumpversion.cfg").write(dedent("""
+            [bumpversion]
+            current_version = 1.0.0
+            {}
+            [bumpversion:file:VERSION]
+            """.format(setting)).strip())
+    check_call([git, "add", "."])
+    check_call([git, "commit", "-m", "initial commit"])
+    tmpdir.join(dirty).write("changed 1.0.0")
+
+    if setting == "dirty_scope = files" and dirty != "other":
+        with pytest.raises(WorkingDirectoryIsDirtyException):
+            main(['--batch', '.', 'patch'])
+        assert '1.0.0' == tmpdir.join("beta", "VERSION").read()
+    else:
+        main(['--batch', '.', 'patch'])
+        assert '1.0.1' == tmpdir.join("beta", "VERSION").read()
+
+
+def test_batch_mode_single_commit(tmpdir, vcs):
+    tmpdir.chdir()
+    check_call([vcs, "init"])
+    for package, version in (("alpha", "1.0.0"), ("beta", "2.3.4")):
+        tmpdir.mkdir(package).join("VERSION").write(version)
+        tmpdir.join(package, ".bumpversion.cfg").write(dedent("""
+            [bumpversion]
+            current_version = {version}
+            commit = True
+            tag = True
+            tag_name = {package}-v{{new_version}}
+            message = Bump {package}: {{current_version}} -> {{new_version}}
+            [bumpversion:file:VERSION]
+            """.format(package=package, version=version)).strip())
+        check_call([vcs, "add", package])
+    check_call([vcs, "commit", "-m", "initial commit"])
+
+    main(['--batch', 'alpha/.bumpversion.cfg', '--batch', 'beta', 'patch'])
+
+    assert '1.0.1' == tmpdir.join("alpha", "VERSION").read()
+    assert '2.3.5' == tmpdir.join("beta", "VERSION").read()
+
+    log = check_output([vcs, "log", "-v"]).decode("utf-8")
+    assert log.count("Bump alpha: 1.0.0 -> 1.0.1") == 1
+    assert log.count("Bump beta: 2.3.4 -> 2.3.5") == 1
+    assert log.index("Bump alpha") < log.index("Bump beta") < log.index("initial commit")
+
+    tags = check_output([vcs, "tags"] if vcs == "hg" else [vcs, "tag"]).decode("utf-8")
+    assert "alpha-v1.0.1" in tags
+    assert "beta-v2.3.5" in tags
+
+
+def test_commit_adds_files_in_chunks(tmpdir, git, monkeypatch):
+    monkeypatch.setattr("bumpversion.vcs.MAX_COMMAND_LENGTH", 80)
+    tmpdir.chdir()
+    check_call([git, "init"])
+    file_names = ["file{:02}.txt".format(i) for i in range(12)]
+    for file_name in file_names:
+        tmpdir.join(file_name).write("1.0.0")
+    check_call([git, "add"] + file_names)
+    check_call([git, "commit", "-m", "initial commit"])
+
+    with mock.patch("subprocess.check_output", side_effect=check_output) as mocked:
+        main(['patch', '--current-version', '1.0.0', '--commit'] + file_names)
+
+    add_calls = [args[0] for _, args, _ in mocked.mock_calls if args[0][:2] == ["git", "add"]]
+    assert 1 < len(add_calls) < len(file_names)
+    assert sorted(a for call in add_calls for a in call if a.startswith("file")) == file_names
+    assert all(len(" ".join(call)) < 80 for call in add_calls)
+
+    assert "" == check_output([git, "status", "--porcelain"]).decode("utf-8")
+    assert "1.0.1" == tmpdir.join("file11.txt").read()
+
+
 def test_non_vcs_operations_if_vcs_is_not_installed(tmpdir, vcs, monkeypatch):
     monkeypatch.setenv(str("PATH"), str(""))
 
@@ -1009,6 +1275,48 @@ def test_non_vcs_operations_if_vcs_is_not_installed(tmpdir, vcs, monkeypatch):
     assert '32.0.0' == tmpdir.join("VERSION").read()
 
 
+@pytest.mark.parametrize("vcs_class, other_class", [
+    pytest.param(Git, Mercurial, marks=xfail_if_no_git(), id="git"),
+    pytest.param(Mercurial, Git, marks=xfail_if_no_hg(), id="hg"),
+])
+def test_vcs_is_detected_without_subprocess(tmpdir, vcs_class, other_class):
+    tmpdir.chdir()
+    check_call([vcs_class._TEST_USABLE_COMMAND[0], "init"])
+    tmpdir.mkdir("sub").chdir()
+
+    with mock.patch("subprocess.Popen") as mocked:
+        assert vcs_class.is_usable()
+        assert not other_class.is_usable()
+    assert not mocked.mock_calls
+
+
+@xfail_if_no_git
+def test_git_worktree_is_detected_without_subprocess(tmpdir):
+    tmpdir.mkdir("main").chdir()
+    check_call(["git", "init"])
+    tmpdir.join("main", "VERSION").write("1.0.0")
+    check_call(["git", "add", "VERSION"])
+    check_call(["git", "commit", "-m", "initial commit"])
+    check_call(["git", "worktree", "add", "../worktree"])
+    tmpdir.join("worktree").chdir()
+    assert tmpdir.join("worktree", ".git").isfile()
+
+    with mock.patch("subprocess.Popen") as mocked:
+        assert Git.is_usable()
+    assert not mocked.mock_calls
+
+
+@xfail_if_no_git
+def test_git_dir_in_environment_asks_git(tmpdir, monkeypatch):
+    tmpdir.chdir()
+    check_call(["git", "init", "repo"])
+    monkeypatch.setenv(str("GIT_DIR"), str(tmpdir.join("repo", ".git")))
+
+    with mock.patch("subprocess.call", wraps=subprocess.call) as mocked:
+        assert Git.is_usable()
+    assert mocked.call_args[0][0] == ["git", "rev-parse", "--git-dir"]
+
+
 def test_serialize_newline(tmpdir):
     tmpdir.join("file_new_line").write("MAJOR=31\nMINOR=0\nPATCH=3\n")
     tmpdir.chdir()
@@ -1182,7 +1490,9 @@ def test_complex_info_logging(tmpdir, capsys):
         ('bumpversion.list', 'INFO', 'parse=(?P<major>\\d+)\\.(?P<minor>\\d+)(\\.(?P<patch>\\d+))?'),
         ('bumpversion.list', 'INFO', 'new_version=0.4.1'),
         ('bumpversion.cli', 'INFO', 'Writing to config file .bumpversion.cfg:'),
-        ('bumpversion.cli', 'INFO', '[bumpversion]\ncurrent_version = 0.4.1\nserialize = \n\t{major}.{minor}.{patch}\n\t{major}.{minor}\nparse = (?P<major>\\d+)\\.(?P<minor>\\d+)(\\.(?P<patch>\\d+))?\n\n[bumpversion:file:fileE]\n\n')
+        ('bumpversion.cli', 'INFO', '[bumpversion]\ncurrent_version = 0.4.1\nserialize = \n\t{major}.{minor}.{patch}\n\t{major}.{minor}\nparse = (?P<major>\\d+)\\.(?P<minor>\\d+)(\\.(?P<patch>\\d+))?\n\n[bumpversion:file:fileE]\n\n'),
+        ('bumpversion.list', 'INFO', 'touched_file=fileE'),
+        ('bumpversion.list', 'INFO', 'touched_file=.bumpversion.cfg')
     )
 
 
@@ -1234,6 +1544,8 @@ def test_subjunctive_dry_run_logging(tmpdir, vcs):
         ('bumpversion.list', 'INFO', 'new_version=0.8.1'),
         ('bumpversion.cli', 'INFO', 'Would write to config file .bumpversion.cfg:'),
         ('bumpversion.cli', 'INFO', '[bumpversion]\ncurrent_version = 0.8.1\ncommit = True\ntag = True\nserialize = \n\t{major}.{minor}.{patch}\n\t{major}.{minor}\nparse = (?P<major>\\d+)\\.(?P<minor>\\d+)(\\.(?P<patch>\\d+))?\n\n[bumpversion:file:dont_touch_me.txt]\n\n'),
+        ('bumpversion.list', 'INFO', 'touched_file=dont_touch_me.txt'),
+        ('bumpversion.list', 'INFO', 'touched_file=.bumpversion.cfg'),
         ('bumpversion.cli', 'INFO', 'Would prepare {vcs} commit'.format(vcs=vcs_name)),
         ('bumpversion.cli', 'INFO', "Would add changes in file 'dont_touch_me.txt' to {vcs}".format(vcs=vcs_name)),
         ('bumpversion.cli', 'INFO', "Would add changes in file '.bumpversion.cfg' to {vcs}".format(vcs=vcs_name)),
@@ -1283,6 +1595,8 @@ def test_log_commit_message_if_no_commit_tag_but_usable_vcs(tmpdir, vcs):
         ('bumpversion.list', 'INFO', 'new_version=0.3.4'),
         ('bumpversion.cli', 'INFO', 'Writing to config file .bumpversion.cfg:'),
         ('bumpversion.cli', 'INFO', '[bumpversion]\ncurrent_version = 0.3.4\ncommit = False\ntag = False\n\n[bumpversion:file:please_touch_me.txt]\n\n'),
+        ('bumpversion.list', 'INFO', 'touched_file=please_touch_me.txt'),
+        ('bumpversion.list', 'INFO', 'touched_file=.bumpversion.cfg'),
         ('bumpversion.cli', 'INFO', 'Would prepare {vcs} commit'.format(vcs=vcs_name)),
         ('bumpversion.cli', 'INFO', "Would add changes in file 'please_touch_me.txt' to {vcs}".format(vcs=vcs_name)),
         ('bumpversion.cli', 'INFO', "Would add changes in file '.bumpversion.cfg' to {vcs}".format(vcs=vcs_name)),
@@ -1315,6 +1629,8 @@ def test_listing(tmpdir, vcs):
         ('bumpversion.list', 'INFO', 'commit=False'),
         ('bumpversion.list', 'INFO', 'tag=False'),
         ('bumpversion.list', 'INFO', 'new_version=0.5.6'),
+        ('bumpversion.list', 'INFO', 'touched_file=please_list_me.txt'),
+        ('bumpversion.list', 'INFO', 'touched_file=.bumpversion.cfg'),
     )
 
 
@@ -1561,6 +1877,167 @@ def test_multi_file_configuration2(tmpdir, capsys):
     assert '1.7.1+bob+38945' in tmpdir.join("BUILD_NUMBER").read()
 
 
+def _write_many_files_config(tmpdir, count):
+    config = ["[bumpversion]", "current_version = 3.1.4"]
+    for i in range(count):
+        tmpdir.join("file{}.txt".format(i)).write("version = 3.1.4\n")
+        config.append("[bumpversion:file:file{}.txt]".format(i))
+    tmpdir.join(".bumpversion.cfg").write("\n".join(config))
+
+
+def test_parallel_jobs_log_in_config_order(tmpdir):
+    tmpdir.chdir()
+
+    _write_many_files_config(tmpdir, 20)
+    with LogCapture() as sequential_capture:
+        main(['patch', '--verbose', '--dry-run'])
+
+    with LogCapture() as parallel_capture:
+        main(['patch', '--verbose', '--dry-run', '--jobs', '8'])
+
+    sequential = [(r.name, r.levelname, r.getMessage()) for r in sequential_capture.records]
+    parallel = [(r.name, r.levelname, r.getMessage()) for r in parallel_capture.records]
+    assert sequential == parallel
+
+    main(['patch', '-j', '8'])
+
+    for i in range(20):
+        assert "version = 3.1.5\n" == tmpdir.join("file{}.txt".format(i)).read()
+
+
+def test_parallel_jobs_report_first_error_in_config_order(tmpdir):
+    tmpdir.chdir()
+
+    _write_many_files_config(tmpdir, 10)
+    tmpdir.join("file3.txt").write("nothing to see here")
+    tmpdir.join("file7.txt").remove()
+
+    with pytest.raises(AssertionError) as exc:
+        main(['patch', '--jobs', '4'])
+
+    assert "file3.txt" in str(exc.value)
+    assert "version = 3.1.4\n" == tmpdir.join("file0.txt").read()
+
+
+@pytest.mark.parametrize("large_file_size", [None, 1])
+def test_unchanged_files_are_not_written(tmpdir, large_file_size, monkeypatch):
+    if large_file_size:
+        # through the memory map
+        monkeypatch.setattr("bumpversion.utils.LARGE_FILE_SIZE", large_file_size)
+    tmpdir.chdir()
+    tmpdir.join("VERSION").write("1.0.0")
+    tmpdir.join("unchanged.txt").write("name = demo\n")
+    os.utime(str(tmpdir.join("unchanged.txt")), (1000000000, 1000000000))
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 1.0.0
+        [bumpversion:file:VERSION]
+        [bumpversion:file:unchanged.txt]
+        search = name = demo
+        replace = name = demo
+        """).strip())
+
+    with LogCapture("bumpversion.list") as log_capture:
+        main(['patch'])
+
+    assert "1.0.1" == tmpdir.join("VERSION").read()
+    assert 1000000000 == tmpdir.join("unchanged.txt").mtime()
+    assert [r.getMessage() for r in log_capture.records if "touched_file" in r.getMessage()] == [
+        "touched_file=VERSION",
+        "touched_file=.bumpversion.cfg",
+    ]
+
+
+def test_patch_applies_with_git(tmpdir, capsys):
+    tmpdir.chdir()
+    tmpdir.join("VERSION").write_binary(b"release\r\n1.0.0")
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 1.0.0
+        [bumpversion:file:VERSION]
+        """).strip())
+    check_call(["git", "init"])
+    check_call(["git", "add", "."])
+    check_call(["git", "commit", "-m", "initial commit"])
+    capsys.readouterr()
+
+    main(['--patch', '-', 'major'])
+
+    patch, _ = capsys.readouterr()
+    assert "diff --git a/VERSION b/VERSION\n" in patch
+    assert "\\ No newline at end of file\n" in patch
+    assert b"release\r\n1.0.0" == tmpdir.join("VERSION").read_binary()
+
+    tmpdir.join("bump.patch").write_binary(patch.encode("utf-8"))
+    check_call(["git", "apply", "bump.patch"])
+    assert b"release\r\n2.0.0" == tmpdir.join("VERSION").read_binary()
+    assert "current_version = 2.0.0" in tmpdir.join(".bumpversion.cfg").read()
+
+
+def test_profile_writes_stats_and_summary(tmpdir, capsys):
+    tmpdir.chdir()
+    tmpdir.join("VERSION").write("1.0.0")
+
+    main(['patch', '--current-version', '1.0.0', '--profile', 'bump.prof', 'VERSION'])
+
+    assert "1.0.1" == tmpdir.join("VERSION").read()
+    _, err = capsys.readouterr()
+    assert "function calls" in err
+
+    import pstats
+    stats = pstats.Stats(str(tmpdir.join("bump.prof")))
+    assert any(name == "_main" for _, _, name in stats.stats)
+
+
+def test_each_file_is_read_once(tmpdir):
+    tmpdir.chdir()
+    tmpdir.join("VERSION").write("7.0.0")
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 7.0.0
+        files = VERSION
+        [bumpversion:file:VERSION]
+        search = 7.0.0
+        replace = {new_version}
+        """).strip())
+
+    with mock.patch("bumpversion.utils.io.open", side_effect=io.open) as mocked_open:
+        main(['major'])
+
+    modes = [args[1] for name, args, _ in mocked_open.mock_calls if args and args[0] == "VERSION"]
+    assert modes == ["rt", "wt"]
+    assert "8.0.0" == tmpdir.join("VERSION").read()
+
+
+def test_glob_file_sections(tmpdir):
+    tmpdir.chdir()
+    for path in ("src/a/__init__.py", "src/b/c/__init__.py", "src/skip/__init__.py"):
+        tmpdir.join(path).ensure().write("__version__ = '0.1.0'\n")
+    tmpdir.join("setup.py").write("version='0.1.0'")
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 0.1.0
+
+        [bumpversion:glob:src/**/__init__.py]
+        search = __version__ = '{current_version}'
+        replace = __version__ = '{new_version}'
+        exclude =
+          src/skip/**
+
+        [bumpversion:file:setup.py]
+        """).strip())
+
+    with LogCapture() as log_capture:
+        main(['minor', '--verbose'])
+
+    assert [r for r in log_capture.records if r.name == 'bumpversion.walker'][0].getMessage().startswith(
+        "Found 2 files matching 'src/**/__init__.py' in ")
+    assert "__version__ = '0.2.0'\n" == tmpdir.join("src/a/__init__.py").read()
+    assert "__version__ = '0.2.0'\n" == tmpdir.join("src/b/c/__init__.py").read()
+    assert "__version__ = '0.1.0'\n" == tmpdir.join("src/skip/__init__.py").read()
+    assert "version='0.2.0'" == tmpdir.join("setup.py").read()
+
+
 def test_search_replace_to_avoid_updating_unconcerned_lines(tmpdir, capsys):
     tmpdir.chdir()
 
@@ -1595,7 +2072,9 @@ def test_search_replace_to_avoid_updating_unconcerned_lines(tmpdir, capsys):
         ('bumpversion.list', 'INFO', 'current_version=1.5.6'),
         ('bumpversion.list', 'INFO', 'new_version=1.6.0'),
         ('bumpversion.cli', 'INFO', 'Writing to config file .bumpversion.cfg:'),
-        ('bumpversion.cli', 'INFO', '[bumpversion]\ncurrent_version = 1.6.0\n\n[bumpversion:file:requirements.txt]\nsearch = MyProject=={current_version}\nreplace = MyProject=={new_version}\n\n')
+        ('bumpversion.cli', 'INFO', '[bumpversion]\ncurrent_version = 1.6.0\n\n[bumpversion:file:requirements.txt]\nsearch = MyProject=={current_version}\nreplace = MyProject=={new_version}\n\n'),
+        ('bumpversion.list', 'INFO', 'touched_file=requirements.txt'),
+        ('bumpversion.list', 'INFO', 'touched_file=.bumpversion.cfg')
     )
 
     assert 'MyProject==1.6.0' in tmpdir.join("requirements.txt").read()
@@ -1792,6 +2271,55 @@ def test_multi_line_search_is_found(tmpdir):
     """) == tmpdir.join("the_alphabet.txt").read()
 
 
+@pytest.mark.parametrize("newline", [b'\n', b'\r\n'])
+def test_large_file_is_searched_and_replaced_through_memory_map(tmpdir, newline, monkeypatch):
+    monkeypatch.setattr("bumpversion.utils.LARGE_FILE_SIZE", 1)
+    monkeypatch.setattr("bumpversion.utils._CHUNK_SIZE", 7)
+    tmpdir.chdir()
+
+    content = newline.join([b"header", b"A", b"B", b"C x", b"middle 9.8.7", b"A", b"B", b"end", b""])
+    tmpdir.join("big.txt").write_binary(content)
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 9.8.7
+
+        [bumpversion:file:big.txt]
+        search =
+          A
+          B
+          C
+        replace =
+          A
+          B
+          C {new_version}
+        """).strip())
+
+    with LogCapture() as log_capture:
+        main(['major', '--verbose'])
+
+    log_capture.check_present(
+        ('bumpversion.utils', 'INFO', "Found '\nA\nB\nC' in big.txt at line 0: C x"),
+    )
+    assert newline.join([
+        b"header", b"A", b"B", b"C 10.0.0 x", b"middle 9.8.7", b"A", b"B", b"end", b""
+    ]) == tmpdir.join("big.txt").read_binary()
+
+
+def test_large_file_falls_back_to_original_version(tmpdir, monkeypatch):
+    monkeypatch.setattr("bumpversion.utils.LARGE_FILE_SIZE", 1)
+    tmpdir.chdir()
+
+    tmpdir.join("big.txt").write("version: 1.2.3\nalso 1.2.3\n")
+    main(['minor', '--current-version', '1.2.3', '--search', 'version: {current_version}', 'big.txt', '--dry-run'])
+    assert "version: 1.2.3\nalso 1.2.3\n" == tmpdir.join("big.txt").read()
+
+    main(['minor', '--current-version', '1.2.3', 'big.txt'])
+    assert "version: 1.3.0\nalso 1.3.0\n" == tmpdir.join("big.txt").read()
+
+    with pytest.raises(AssertionError):
+        main(['minor', '--current-version', '1.2.3', 'big.txt'])
+
+
 @xfail_if_old_configparser
 def test_configparser_empty_lines_in_values(tmpdir):
     tmpdir.chdir()
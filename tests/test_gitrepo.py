@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import subprocess
+import zlib
+
+import mock
+import pytest
+
+from bumpversion.gitrepo import GitRepository, UnsupportedRepository
+from bumpversion.vcs import Git
+
+
+pytestmark = pytest.mark.xfail(
+    subprocess.call(["git", "version"]) != 0,
+    reason="git is not installed"
+)
+
+
+def git(*args):
+    return subprocess.check_output(("git",) + args).decode("utf-8").strip()
+
+
+def commit(tmpdir, content):
+    tmpdir.join("VERSION").write(content)
+    git("add", "VERSION")
+    git("commit", "-m", "Change to {}".format(content))
+
+
+def describe():
+    return git("describe", "--tags", "--long", "--abbrev=40", "--match=v*").rsplit("-", 2)
+
+
+@pytest.fixture
+def repository(tmpdir):
+    tmpdir.chdir()
+    git("init")
+    for i in range(30):
+        commit(tmpdir, "0.{}.0\n".format(i) + "common content\n" * 100)
+        if i == 5:
+            git("tag", "v0.5.0")
+        if i == 10:
+            git("tag", "not-a-version")
+            git("tag", "v0.10.0-light")
+            git("tag", "-a", "v0.10.0", "-m", "Annotated")
+        if i == 20:
+            git("tag", "-a", "v0.20.0", "-m", "Annotated")
+    return tmpdir
+
+
+@pytest.mark.parametrize("gc", [False, True], ids=["loose", "packed"])
+def test_describe_like_git(repository, gc):
+    if gc:
+        git("gc", "--aggressive", "--quiet")
+        assert not repository.join(".git", "refs", "tags", "v0.5.0").exists()
+
+    name, distance, head = GitRepository(".git").describe("v")
+    assert [name, "{}".format(distance), "g" + head] == describe()
+    assert (name, distance) == ("v0.20.0", 9)
+
+
+@pytest.mark.parametrize("gc", [False, True], ids=["loose", "packed"])
+def test_describe_prefers_annotated_tags(repository, gc):
+    git("checkout", "--quiet", "v0.10.0")
+    git("commit", "--allow-empty", "-m", "Detached")
+    if gc:
+        git("gc", "--quiet")
+
+    name, distance, _ = GitRepository(".git").describe("v")
+    assert [name, "{}".format(distance)] == describe()[:2]
+    assert (name, distance) == ("v0.10.0", 1)
+
+
+def test_describe_without_tags(tmpdir):
+    tmpdir.chdir()
+    git("init")
+    assert GitRepository(".git").describe("v") is None
+    commit(tmpdir, "1.0.0")
+    assert GitRepository(".git").describe("v") is None
+
+
+def test_describe_stops_at_merges(repository):
+    git("checkout", "--quiet", "-b", "feature", "HEAD~2")
+    git("commit", "--allow-empty", "-m", "Feature")
+    git("checkout", "--quiet", "-")
+    git("merge", "--no-ff", "-m", "Merge", "feature")
+
+    with pytest.raises(UnsupportedRepository):
+        GitRepository(".git").describe("v")
+    assert Git.latest_tag_info()["distance_to_latest_tag"] == int(describe()[1])
+
+
+def test_latest_tag_info_without_subprocess(repository):
+    git("gc", "--quiet")
+
+    with mock.patch("subprocess.Popen") as mocked:
+        info = Git.latest_tag_info()
+    assert not mocked.mock_calls
+    assert info == {
+        "commit_sha": git("rev-parse", "HEAD"),
+        "distance_to_latest_tag": 9,
+        "current_version": "0.20.0",
+    }
+
+
+def test_pack_without_pack_file_is_unsupported(repository):
+    git("gc", "--quiet")
+    for pack in repository.join(".git", "objects", "pack").listdir("*.pack"):
+        pack.remove()
+
+    with pytest.raises(UnsupportedRepository):
+        GitRepository(".git").describe("v")
+
+
+def test_corrupt_pack_is_unsupported(repository):
+    git("gc", "--quiet")
+    for pack in repository.join(".git", "objects", "pack").listdir("*.pack"):
+        data = pack.read_binary()
+        pack.write_binary(data[:12] + b"\xff" * (len(data) - 12))
+
+    with pytest.raises(UnsupportedRepository):
+        GitRepository(".git").describe("v")
+
+
+def test_unreadable_objects_fall_back_to_git(repository):
+    with mock.patch("bumpversion.gitrepo.zlib.decompress", side_effect=zlib.error("corrupt")):
+        info = Git.latest_tag_info()
+    assert info["distance_to_latest_tag"] == int(describe()[1])
+    assert info["current_version"] == "0.20.0"
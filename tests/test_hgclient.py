@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import subprocess
+
+import mock
+import pytest
+
+from bumpversion.hgclient import CommandServer, CommandServerUnavailable
+from bumpversion.vcs import Mercurial
+
+
+pytestmark = pytest.mark.xfail(
+    subprocess.call(["hg", "version"]) != 0,
+    reason="hg is not installed"
+)
+
+
+def hg(*args):
+    return subprocess.check_output(("hg",) + args).decode("utf-8").strip()
+
+
+@pytest.fixture
+def repository(tmpdir):
+    tmpdir.chdir()
+    hg("init")
+    tmpdir.join("VERSION").write("1.0.0")
+    hg("add", "VERSION")
+    hg("commit", "-m", "initial")
+    return tmpdir
+
+
+def test_runcommand(repository):
+    server = CommandServer()
+    try:
+        assert server.runcommand(["log", "--template", "{desc}"]) == (0, b"initial", b"")
+
+        # changes made by other hg processes are seen
+        hg("tag", "v1.0.0")
+        returncode, output, _ = server.runcommand(["log", "--rev", "tip", "--template", "{desc}"])
+        assert (returncode, output) == (0, b"Added tag v1.0.0 for changeset " + hg(
+            "log", "--rev", "0", "--template", "{node|short}"
+        ).encode())
+
+        returncode, _, error = server.runcommand(["status", "--", "missing"])
+        assert returncode == 0 and b"missing" in error
+        assert server.runcommand(["tag", "v1.0.0"])[0] != 0
+    finally:
+        server.close()
+
+
+def test_hg_not_installed(repository, monkeypatch):
+    monkeypatch.setattr(CommandServer, "COMMAND", ["hg-not-installed", "serve"])
+    with pytest.raises(CommandServerUnavailable):
+        CommandServer()
+
+
+def test_output_runs_hg_without_command_server(repository):
+    with mock.patch(
+        "bumpversion.vcs.CommandServer", side_effect=CommandServerUnavailable("unavailable")
+    ):
+        Mercurial.assert_nondirty()
+        assert Mercurial.current_commit() == hg("log", "--rev", ".", "--template", "{node}")
+
+
+def test_command_server_is_shared(repository):
+    with mock.patch("bumpversion.vcs.CommandServer", wraps=CommandServer) as server:
+        Mercurial.assert_nondirty()
+        Mercurial.tag(False, "v1.0.0", None)
+        assert Mercurial.current_commit() == hg("log", "--rev", ".", "--template", "{node}")
+    assert server.call_count == 1
+    assert "v1.0.0" in hg("tags")
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import os
+from textwrap import dedent
+
+import mock
+
+from bumpversion.cli import main
+from bumpversion.index import VersionIndex
+
+
+CONTENT = "name = demo\nversion = 1.0.1\nrequires = demo==1.0.1\n"
+
+
+def _recorded_index(tmpdir):
+    # an index written well after the file was
+    tmpdir.join("setup.cfg").write(CONTENT)
+    stat = tmpdir.join("setup.cfg").stat()
+    os.utime(str(tmpdir.join("setup.cfg")), (stat.atime, stat.mtime - 10))
+    index = VersionIndex(str(tmpdir.join("index")))
+    index.record(str(tmpdir.join("setup.cfg")), CONTENT, ["1.0.1"])
+    index.save()
+    return VersionIndex.load(str(tmpdir.join("index")))
+
+
+def test_lookup_after_record(tmpdir):
+    index = _recorded_index(tmpdir)
+
+    with mock.patch("bumpversion.index.content_hash") as content_hash:
+        assert index.lookup(str(tmpdir.join("setup.cfg")), CONTENT, "1.0.1") == [(22, 1), (45, 2)]
+    assert not content_hash.called
+    assert index.lookup(str(tmpdir.join("setup.cfg")), CONTENT, "version = 1.0.1") is None
+    assert index.lookup(str(tmpdir.join("other.cfg")), CONTENT, "1.0.1") is None
+
+
+def test_lookup_in_changed_content(tmpdir):
+    index = _recorded_index(tmpdir)
+
+    changed = CONTENT.replace("demo\n", "demo2\n")
+    tmpdir.join("setup.cfg").write(changed)
+    assert index.lookup(str(tmpdir.join("setup.cfg")), changed, "1.0.1") is None
+
+
+def test_lookup_of_racily_clean_file_compares_content(tmpdir):
+    tmpdir.join("setup.cfg").write(CONTENT)
+    index = VersionIndex(str(tmpdir.join("index")))
+    index.record(str(tmpdir.join("setup.cfg")), CONTENT, ["1.0.1"])
+    index.save()
+    # modified in the same instant the index was written
+    mtime = tmpdir.join("setup.cfg").stat().mtime
+    os.utime(str(tmpdir.join("index")), (mtime, mtime))
+    index = VersionIndex.load(str(tmpdir.join("index")))
+
+    assert index.lookup(str(tmpdir.join("setup.cfg")), CONTENT, "1.0.1") == [(22, 1), (45, 2)]
+    same_size = CONTENT.replace("demo\n", "dem0\n")
+    assert index.lookup(str(tmpdir.join("setup.cfg")), same_size, "1.0.1") is None
+
+
+def test_unreadable_index_is_empty(tmpdir):
+    tmpdir.join("index").write("{not json")
+    assert VersionIndex.load(str(tmpdir.join("index"))).lookup("setup.cfg", CONTENT, "1.0.1") is None
+
+    tmpdir.join("index").write('{"format": 0, "files": {}}')
+    assert VersionIndex.load(str(tmpdir.join("index"))).lookup("setup.cfg", CONTENT, "1.0.1") is None
+
+
+def _write_config(tmpdir):
+    tmpdir.join("VERSION").write("version 1.0.0\nbuilt from 1.0.0\n")
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 1.0.0
+        index = .bumpversion.index
+        [bumpversion:file:VERSION]
+        """).strip())
+
+
+def test_bump_uses_index_of_last_bump(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    main(["patch"])
+    assert tmpdir.join(".bumpversion.index").check()
+
+    with mock.patch("bumpversion.utils.find_lines") as find_lines:
+        main(["patch"])
+
+    assert not find_lines.called
+    assert "version 1.0.2\nbuilt from 1.0.2\n" == tmpdir.join("VERSION").read()
+
+
+def test_bump_searches_files_changed_since_last_bump(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    main(["patch"])
+    tmpdir.join("VERSION").write("release 1.0.1\n")
+
+    main(["patch"])
+
+    assert "release 1.0.2\n" == tmpdir.join("VERSION").read()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import json
+from subprocess import check_call, check_output
+from textwrap import dedent
+
+import pytest
+
+from bumpversion.cli import main
+from bumpversion.exceptions import PlanDoesNotApplyException
+
+
+def _write_config(tmpdir):
+    tmpdir.join("VERSION").write("1.0.0")
+    tmpdir.join("README").write("Install 1.0.0, not 1.0.0-rc1\r\n")
+    tmpdir.join(".bumpversion.cfg").write(dedent("""
+        [bumpversion]
+        current_version = 1.0.0
+        [bumpversion:file:VERSION]
+        [bumpversion:file:README]
+        search = Install {current_version}
+        replace = Install {new_version}
+        """).strip())
+
+
+def test_plan_changes_nothing(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    config = tmpdir.join(".bumpversion.cfg").read()
+
+    main(["--plan", "plan.json", "minor"])
+
+    assert "1.0.0" == tmpdir.join("VERSION").read()
+    assert config == tmpdir.join(".bumpversion.cfg").read()
+    plan = json.loads(tmpdir.join("plan.json").read())
+    assert [f["path"] for f in plan["files"]] == ["VERSION", "README", ".bumpversion.cfg"]
+    assert plan["files"][1]["edits"] == [[0, "Install 1.0.0", "Install 1.1.0"]]
+
+
+def test_apply_makes_planned_changes(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    main(["--plan", "plan.json", "minor"])
+
+    main(["--apply", "plan.json"])
+
+    assert "1.1.0" == tmpdir.join("VERSION").read()
+    assert b"Install 1.1.0, not 1.0.0-rc1\r\n" == tmpdir.join("README").read_binary()
+    assert "current_version = 1.1.0" in tmpdir.join(".bumpversion.cfg").read()
+
+
+def test_apply_with_dry_run_changes_nothing(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    check_call(["git", "init"])
+    check_call(["git", "add", "."])
+    check_call(["git", "commit", "-m", "initial commit"])
+    main(["--plan", "plan.json", "--commit", "--tag", "minor"])
+
+    main(["--apply", "plan.json", "--dry-run"])
+
+    assert "1.0.0" == tmpdir.join("VERSION").read()
+    assert b"" == check_output(["git", "tag"])
+    assert b"initial commit\n" == check_output(["git", "log", "--format=%s"])
+
+    # a plan that doesn't apply anymore is still reported
+    tmpdir.join("README").write("Install 1.0.0 now\n")
+    with pytest.raises(PlanDoesNotApplyException):
+        main(["--apply", "plan.json", "-n"])
+
+
+def test_apply_cannot_be_combined_with_batch(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    main(["--plan", "plan.json", "minor"])
+
+    with pytest.raises(SystemExit):
+        main(["--apply", "plan.json", "--batch", "."])
+
+    assert "1.0.0" == tmpdir.join("VERSION").read()
+
+
+def test_apply_changes_nothing_if_a_file_changed(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    main(["--plan", "plan.json", "minor"])
+    tmpdir.join("README").write("Install 1.0.0 now\n")
+
+    with pytest.raises(PlanDoesNotApplyException):
+        main(["--apply", "plan.json"])
+
+    assert "1.0.0" == tmpdir.join("VERSION").read()
+
+
+def test_apply_commits_and_tags(tmpdir):
+    tmpdir.chdir()
+    _write_config(tmpdir)
+    check_call(["git", "init"])
+    check_call(["git", "add", "."])
+    check_call(["git", "commit", "-m", "initial commit"])
+    main(["--plan", "plan.json", "--commit", "--tag", "patch"])
+
+    main(["--apply", "plan.json"])
+
+    assert b"v1.0.1" in check_output(["git", "tag"])
+    log = check_output(["git", "log", "-1", "--name-only", "--format=%s"]).decode("utf-8")
+    assert "Bump version: 1.0.0 → 1.0.1" in log
+    assert {"VERSION", "README", ".bumpversion.cfg"} <= set(log.split())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from bumpversion import cli, client, server as server_module
+
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"),
+    reason="the server needs Unix sockets and fork",
+)
+
+CONFIG = "[bumpversion]\ncurrent_version = {}\n\n[bumpversion:file:VERSION]\n"
+
+
+@pytest.fixture
+def server(tmpdir):
+    socket_path = str(tmpdir.join("bumpversion.sock"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "bumpversion.server", "--socket", socket_path],
+        stderr=subprocess.PIPE,
+    )
+    for _ in range(100):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.05)
+    yield socket_path
+    process.terminate()
+    process.wait()
+    assert not os.path.exists(socket_path)
+
+
+@pytest.fixture
+def package(tmpdir):
+    directory = tmpdir.mkdir("package")
+    directory.join(".bumpversion.cfg").write(CONFIG.format("0.1.0"))
+    directory.join("VERSION").write("0.1.0")
+    directory.chdir()
+    return directory
+
+
+def test_bump_in_server(server, package):
+    response = client.request(["patch", "--list"], server)
+    assert response["status"] == 0
+    assert "new_version=0.1.1" in response["stdout"]
+    assert "0.1.1" == package.join("VERSION").read()
+
+    # the cached config must not hide the new version
+    response = client.request(["patch", "--list"], server)
+    assert "new_version=0.1.2" in response["stdout"]
+    assert "0.1.2" == package.join("VERSION").read()
+
+
+def test_server_reports_errors(server, package):
+    response = client.request(["--no-such-option"], server)
+    assert response["status"] == 2
+    assert "usage: bumpversion" in response["stderr"]
+    assert "0.1.0" == package.join("VERSION").read()
+
+
+@pytest.mark.parametrize("request_", [
+    {"cwd": "/nonexistent", "env": {}, "args": ["patch"]},
+    {"env": {}, "args": ["patch"]},
+    {"cwd": ".", "env": {}, "args": "patch"},
+    [],
+])
+def test_server_survives_bad_requests(server, package, request_):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(server)
+        client.send(connection, request_)
+        response = client.receive(connection)
+    finally:
+        connection.close()
+    assert response["status"] == 1
+    assert response["stderr"]
+
+    response = client.request(["patch"], server)
+    assert response["status"] == 0
+    assert "0.1.1" == package.join("VERSION").read()
+
+
+def test_slow_client_does_not_block_others(server, package):
+    slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        slow.connect(server)
+        started = time.time()
+        response = client.request(["patch"], server)
+        assert time.time() - started < server_module.REQUEST_TIMEOUT
+    finally:
+        slow.close()
+    assert response["status"] == 0
+    assert "0.1.1" == package.join("VERSION").read()
+
+
+def test_client_runs_locally_without_server(tmpdir, package, monkeypatch):
+    monkeypatch.setenv(str("BUMPVERSION_SOCKET"), str(tmpdir.join("missing.sock")))
+    client.main(["minor"])
+    assert "0.2.0" == package.join("VERSION").read()
+
+
+def test_config_cache_is_keyed_by_content(package, monkeypatch):
+    monkeypatch.setattr(cli, "_config_cache", {})
+
+    first = cli._load_configuration(".bumpversion.cfg", None, {})
+    defaults = {}
+    assert cli._load_configuration(".bumpversion.cfg", None, defaults) is first
+    assert defaults["current_version"] == "0.1.0"
+
+    package.join(".bumpversion.cfg").write(CONFIG.format("0.1.1"))
+    defaults = {}
+    assert cli._load_configuration(".bumpversion.cfg", None, defaults) is not first
+    assert defaults["current_version"] == "0.1.1"
+
+
+def test_uncacheable_configs_are_left_to_the_child(package, monkeypatch):
+    monkeypatch.setattr(cli, "_config_cache", {})
+    monkeypatch.setattr(cli, "_vcs_cache", {})
+
+    server_module._warm_caches([])
+    assert len(cli._config_cache) == 1
+
+    cli._config_cache.clear()
+    package.join(".bumpversion.cfg").write(
+        "[bumpversion]\ncurrent_version = 0.1.0\n\n[bumpversion:glob:*.txt]\n"
+    )
+    server_module._warm_caches([])
+    server_module._warm_caches(["--batch", "."])
+    assert not cli._config_cache
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="-X importtime needs Python 3.7"
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules only some code paths need, they must not slow down every start
+DEFERRED_MODULES = {"cProfile", "difflib", "platform", "pstats", "subprocess", "tempfile"}
+
+# cumulative microseconds for importing bumpversion.cli, more than ten times
+# what it takes on a laptop, so only real regressions fail
+IMPORT_BUDGET = 250000
+
+
+def importtime(code, *args, **kwargs):
+    """
+    Runs code in a new interpreter without site packages and returns
+    {module: cumulative import time in microseconds} of everything it imported.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen(
+        [sys.executable, "-S", "-X", "importtime", "-c", code] + list(args),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **kwargs
+    )
+    _, stderr = process.communicate()
+    times = {}
+    for line in stderr.decode("utf-8").splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_import_defers_modules():
+    imported = set(importtime("import bumpversion.cli"))
+    assert "bumpversion.cli" in imported
+    # the time context is only determined when running
+    assert not (DEFERRED_MODULES | {"datetime"}) & imported
+
+
+def test_help_defers_modules(tmpdir):
+    imported = set(importtime(
+        "import sys; from bumpversion.cli import main; main(sys.argv[1:])",
+        "--help",
+        cwd=str(tmpdir),
+    ))
+    assert "bumpversion.cli" in imported
+    assert not DEFERRED_MODULES & imported
+
+
+def test_import_time_budget():
+    best = min(importtime("import bumpversion.cli")["bumpversion.cli"] for _ in range(3))
+    assert best < IMPORT_BUDGET
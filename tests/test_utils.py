@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+
+import pytest
+from testfixtures import LogCapture
+
+from bumpversion.utils import (
+    BackgroundCall, build_context, find_lines, map_in_order, prefixed_environ, unified_patch,
+)
+
+
+CONTENT = "first 1.0\nsecond\nthird 1.0 line\nfourth\n"
+
+
+@pytest.mark.parametrize("search, expected", [
+    ("1.0", (0, 9)),
+    ("third 1.0", (17, 31)),
+    ("1.0\nsecond\nthird", (0, 31)),
+    ("second\nthird", (10, 31)),
+    ("st 1.0\nsecond\nthi", (0, 31)),
+    ("1.0\nthird", None),
+    ("1.0\nsecon\nthird", None),
+    ("fourth\n", (32, 38)),
+    ("fourth\nfifth", None),
+])
+def test_find_lines(search, expected):
+    assert find_lines(CONTENT, search.splitlines(), "\n") == expected
+
+
+def test_find_lines_in_bytes_with_crlf():
+    content = CONTENT.replace("\n", "\r\n").encode("utf-8")
+    assert find_lines(content, [b"1.0", b"second", b"third"], b"\r\n") == (0, 33)
+    assert find_lines(content, [b"1.0", b"second", b"third"], b"\n") is None
+
+
+def test_prefixed_environ_looks_up_variables(monkeypatch):
+    monkeypatch.setenv("BUMPVERSION_TEST_VAR", "value")
+    environ = prefixed_environ()
+    assert environ["$BUMPVERSION_TEST_VAR"] == "value"
+    assert "$BUMPVERSION_TEST_VAR" in environ
+    assert "BUMPVERSION_TEST_VAR" not in environ
+    monkeypatch.delenv("BUMPVERSION_TEST_VAR")
+    assert "$BUMPVERSION_TEST_VAR" not in environ
+
+
+def test_build_context_layers_without_copying():
+    base = {"a": 1, "b": 2}
+    context = build_context({"b": 3}, base)
+    child = context.new_child()
+    child["a"] = 4
+    assert (context["a"], context["b"], child["a"]) == (1, 3, 4)
+    assert base == {"a": 1, "b": 2}
+
+
+def test_background_call_replays_log_output_on_result():
+    vcs_logger = logging.getLogger("bumpversion.vcs")
+
+    def query(value):
+        vcs_logger.info("queried %s", value)
+        return value
+
+    with LogCapture() as log_capture:
+        call = BackgroundCall(query, "v1")
+        call._thread.join()
+        log_capture.check()
+        assert call.result() == "v1"
+        assert call.result() == "v1"
+
+    log_capture.check(("bumpversion.vcs", "INFO", "queried v1"))
+
+
+def test_background_call_reraises_exception():
+    def query():
+        raise ValueError("no VCS")
+
+    call = BackgroundCall(query)
+    with pytest.raises(ValueError):
+        call.result()
+
+
+@pytest.mark.parametrize("newline, expected", [
+    ("\r\n", "\r\n"),
+    ("\n", "\n"),
+    (None, "\n"),
+    (("\n", "\r\n"), "\n"),
+])
+def test_unified_patch_uses_newline_of_file(newline, expected):
+    patch = list(unified_patch("VERSION", "release\n1.0.0\n", "release\n2.0.0\n", newline))
+
+    assert "-1.0.0" + expected in patch
+    assert "+2.0.0" + expected in patch
+
+
+def test_map_in_order_replays_log_output_of_all_modules():
+    index_logger = logging.getLogger("bumpversion.index")
+
+    def work(item):
+        index_logger.info("item %s", item)
+        return item
+
+    with LogCapture() as log_capture:
+        assert map_in_order(work, range(8), jobs=4) == list(range(8))
+
+    log_capture.check(*[("bumpversion.index", "INFO", "item {}".format(i)) for i in range(8)])
@@ -1,8 +1,10 @@
+import mock
 import pytest
 
 from bumpversion.version_part import (
     ConfiguredVersionPartConfiguration,
     NumericVersionPartConfiguration,
+    VersionConfig,
     VersionPart,
 )
 
@@ -57,3 +59,18 @@ def test_version_part_equality(confvpc):
 def test_version_part_null(confvpc):
     assert VersionPart(confvpc.first_value, confvpc).null() == VersionPart(
         confvpc.first_value, confvpc)
+
+
+# VersionConfig
+
+def test_version_config_parses_formats_once():
+    version_config = VersionConfig(
+        r"(?P<major>\d+)\.(?P<minor>\d+)", ["{major}.{minor}"], "{current_version}",
+        "{new_version}")
+
+    with mock.patch("bumpversion.version_part.labels_for_format") as labels_for_format:
+        version = version_config.parse("1.2")
+        new_version = version.bump("minor", version_config.order())
+        assert "1.3" == version_config.serialize(new_version, {})
+    assert ("major", "minor") == version_config.order()
+    assert not labels_for_format.called
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import os
+import re
+import subprocess
+
+import pytest
+
+from bumpversion.walker import find_files, translate_glob
+
+
+@pytest.mark.parametrize("pattern, path, matches", [
+    ("src/**/__init__.py", "src/__init__.py", True),
+    ("src/**/__init__.py", "src/a/b/__init__.py", True),
+    ("src/**/__init__.py", "lib/src/__init__.py", False),
+    ("src/*.py", "src/a/b.py", False),
+    ("*.txt", "a.txt", True),
+    ("docs/**", "docs/a/b.rst", True),
+    ("v?.cfg", "v1.cfg", True),
+    ("[!a]*.py", "b.py", True),
+    ("[!a]*.py", "a.py", False),
+    ("[ab].py", "b.py", True),
+])
+def test_translate_glob(pattern, path, matches):
+    assert bool(re.match(translate_glob(pattern), path)) == matches
+
+
+def _make_tree(tmpdir):
+    for path in (
+        "src/pkg/__init__.py",
+        "src/pkg/sub/__init__.py",
+        "src/pkg/sub/module.py",
+        "src/node_modules/dep/__init__.py",
+        "vendor/lib/VERSION",
+        "vendor/lib/node_modules/dep/VERSION",
+        "src/generated/__init__.py",
+        "build/__init__.py",
+    ):
+        tmpdir.join(path).ensure()
+
+
+def test_find_files_walking(tmpdir):
+    _make_tree(tmpdir)
+    tmpdir.chdir()
+
+    assert find_files("src/**/__init__.py", ["src/generated/**"]) == [
+        os.path.join("src", "pkg", "__init__.py"),
+        os.path.join("src", "pkg", "sub", "__init__.py"),
+    ]
+
+
+def test_find_files_in_directories_named_by_the_pattern(tmpdir):
+    _make_tree(tmpdir)
+    tmpdir.chdir()
+
+    assert find_files("vendor/**/VERSION") == [os.path.join("vendor", "lib", "VERSION")]
+    assert find_files("**/node_modules/*/__init__.py") == [
+        os.path.join("src", "node_modules", "dep", "__init__.py"),
+    ]
+
+
+def test_find_files_warns_about_no_matches(tmpdir, caplog):
+    _make_tree(tmpdir)
+    tmpdir.chdir()
+
+    assert find_files("src/**/VERSION") == []
+    assert [
+        (r.levelname, r.getMessage()) for r in caplog.records if r.levelname == "WARNING"
+    ] == [("WARNING", "No files match 'src/**/VERSION'")]
+
+
+def test_find_files_below_root(tmpdir):
+    _make_tree(tmpdir)
+    tmpdir.join("other").ensure(dir=True).chdir()
+
+    assert find_files("**/module.py", root=os.path.join("..", "src")) == [
+        os.path.join("..", "src", "pkg", "sub", "module.py"),
+    ]
+
+
+@pytest.mark.xfail(subprocess.call(["git", "version"]) != 0, reason="git is not installed")
+def test_find_files_skips_git_ignored(tmpdir):
+    _make_tree(tmpdir)
+    tmpdir.chdir()
+    subprocess.check_call(["git", "init"])
+    tmpdir.join(".gitignore").write("generated/\n")
+    tmpdir.join("src", "pkg", "deleted", "__init__.py").ensure()
+    subprocess.check_call(["git", "add", "src/pkg/deleted/__init__.py"])
+    tmpdir.join("src", "pkg", "deleted", "__init__.py").remove()
+
+    assert find_files("src/**/__init__.py") == [
+        os.path.join("src", "pkg", "__init__.py"),
+        os.path.join("src", "pkg", "sub", "__init__.py"),
+    ]